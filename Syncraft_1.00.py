@@ -2,272 +2,19 @@
 # Caption to Narration - ver.5.2 (最終修正版)
 # ===========================================
 
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sqlite3
 import streamlit as st
-import re
-import math
-import xml.etree.ElementTree as ET
-import base64
-from google import genai
-from google.genai.errors import APIError
-
-
-# ===============================================================
-# ▼▼▼ XML解析関連の関数群（デコード部分を根本的に修正）▼▼▼
-# ===============================================================
-
-def decode_premiere_text(base64_string):
-    """
-    Premiereのソーステキスト(Base64)をデコードし、テキスト部分を抽出する（最終修正版）。
-    バイナリデータの中からUTF-8でエンコードされた文字列を直接探し出す。
-    """
-    try:
-        decoded_bytes = base64.b64decode(base64_string)
-        
-        # Premiereのデータ構造では、テキストは多くの場合、特定のバイト列の後に出現する
-        # ここでは、意味のあるUTF-8文字列の開始点を探す
-        # 日本語の多くは3バイトで構成されるため、それらしいバイト列を探す
-        
-        # 最も長いUTF-8として解釈できるバイトシーケンスを探す
-        longest_text = ""
-        # バイト列を少しずつずらしながらデコードを試みる
-        for i in range(len(decoded_bytes)):
-            try:
-                # i番目のバイトから末尾までをUTF-8としてデコード試行
-                chunk = decoded_bytes[i:]
-                text = chunk.decode('utf-8', errors='strict')
-                
-                # デコード成功後、不要な制御文字などを除去
-                clean_text = re.sub(r'[\x00-\x1F\x7F-\x9F]+', '', text).strip()
-                
-                # 最も長いものを本文として採用する
-                if len(clean_text) > len(longest_text):
-                    longest_text = clean_text
-            except UnicodeDecodeError:
-                # デコードに失敗した場合は次のバイトへ
-                continue
-        
-        return longest_text
-
-    except Exception:
-        return ""
-
-
-def parse_premiere_xml(uploaded_file):
-    """
-    XMLファイルを二段階で解析し、テロップ情報を抽出する。
-    """
-    try:
-        tree = ET.parse(uploaded_file)
-        root = tree.getroot()
-
-        hash_to_text_map = {}
-        for param in root.findall(".//parameter"):
-            param_id_node = param.find("parameterid")
-            if param_id_node is not None and param_id_node.text == '1':
-                hash_node = param.find("hash")
-                value_node = param.find("value")
-                
-                if hash_node is not None and hash_node.text and value_node is not None and value_node.text:
-                    text_hash = hash_node.text
-                    if text_hash not in hash_to_text_map:
-                        decoded_text = decode_premiere_text(value_node.text)
-                        if decoded_text:
-                            hash_to_text_map[text_hash] = decoded_text
-
-        output_blocks = []
-        for clipitem in root.findall(".//clipitem"):
-            start_node = clipitem.find("start")
-            end_node = clipitem.find("end")
-            
-            hash_node = None
-            for param in clipitem.findall(".//parameter"):
-                param_id_node = param.find("parameterid")
-                if param_id_node is not None and param_id_node.text == '1':
-                    hash_node = param.find("hash")
-                    break
-
-            if start_node is not None and end_node is not None and hash_node is not None and hash_node.text:
-                text_hash = hash_node.text
-                narration_text = hash_to_text_map.get(text_hash)
-
-                if narration_text:
-                    start_frames = int(start_node.text)
-                    end_frames = int(end_node.text)
-                    start_tc = frames_to_df_timecode(start_frames)
-                    end_tc = frames_to_df_timecode(end_frames)
-                    output_blocks.append(f"{start_tc} - {end_tc}\n{narration_text}")
-        
-        if not output_blocks:
-            return "エラー：XML内に解析可能なテロップデータが見つかりませんでした。ファイル形式が異なる可能性があります。"
-
-        return "\n\n".join(output_blocks)
-
-    except ET.ParseError:
-        return "エラー：XMLファイルの解析に失敗しました。ファイルが破損しているか、形式が正しくありません。"
-    except Exception as e:
-        return f"予期せぬエラーが発生しました: {e}"
-
-def frames_to_df_timecode(total_frames, frame_rate=29.97):
-    if total_frames < 0: return "00;00;00;00"
-    frames_in_minute = 1798
-    frames_in_10_minutes = 17982
-    num_10_minute_chunks = total_frames // frames_in_10_minutes
-    remaining_frames = total_frames % frames_in_10_minutes
-    num_minute_chunks = remaining_frames // frames_in_minute
-    if num_minute_chunks == 10: num_minute_chunks = 9
-    dropped_frames = (18 * num_10_minute_chunks) + (2 * num_minute_chunks)
-    total_non_drop_frames = total_frames + dropped_frames
-    frame_rate_int = 30
-    ff = total_non_drop_frames % frame_rate_int
-    total_seconds = total_non_drop_frames // frame_rate_int
-    ss = total_seconds % 60
-    total_minutes = total_seconds // 60
-    mm = total_minutes % 60
-    hh = total_minutes // 60
-    return f"{hh:02d};{mm:02d};{ss:02d};{ff:02d}"
-
-def check_narration_with_gemini(narration_blocks, api_key):
-    if not api_key: return "エラー：Gemini APIキーが設定されていません。"
-    try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        formatted_text = "\n".join([f"No.{i+1}: {b['text']}" for i, b in enumerate(narration_blocks)])
-        prompt = f"""
-        あなたはプロの校正者です。以下のナレーション原稿の誤字脱字をチェックし、修正案を提示してください。
-        # 制約条件
-        - ナレーション特有の句読点やスペースは修正しない。
-        - 芸能人の名前は正しく校正する。
-        - 文末が不自然でも、意図的なものとして修正しない。
-        - 漢数字は使用せず、算用数字のままにする。
-        - 誤りがない場合は「問題ありませんでした。」とだけ出力する。
-        # 出力形式
-        - 誤りがある場合のみ、以下のMarkdownテーブル形式で出力する。
-        - 「No.」列には必ず元の番号を入れる。
-        - 「修正提案」列で誤字脱字を指摘する時は「○○ → △△」のようにどう間違ってるか明確に記載。
-        - 「理由」列は「〇〇の誤り」、「〇〇では？」のように簡潔に記載する。
-        【出力形式】
-        | No. | 修正提案 | 理由 |
-        |---|---|---|
-        | (番号) | (正しい単語・フレーズ) | (修正理由) |
-        【ナレーション原稿】
-        ---
-        {formatted_text}
-        ---
-        """
-        response = model.generate_content(prompt)
-        return getattr(response, "text", "") or ""
-    except APIError as e: return f"Gemini APIエラーが発生しました。詳細: {e}"
-    except Exception as e: return f"予期せぬエラー: {e}"
+from syncraft_core import (
+    DEFAULT_TIMEBASE, DecodedTextCache, IncrementalNarrationConverter, StageRecorder, build_ai_check_display, build_sequence_scripts_zip,
+    convert_premiere_sequences, default_decoded_text_cache_path, enable_stage_logging, iter_narration_check_results, iter_narration_script_chunks,
+    join_fragment_lines, narration_ai_data, narration_page_ranges, parse_narration_script, parse_premiere_xml_sequences,
+)
 
-def convert_narration_script(text, n_force_insert_flag=True, mm_ss_colon_flag=False, highlight_indices=None):
-    if highlight_indices is None: highlight_indices = set()
-    FRAME_RATE = 30.0; CONNECTION_THRESHOLD = 1.0 + (10.0 / FRAME_RATE)
-    to_zenkaku_num = str.maketrans('0123456789', '０１２３４５６７８９')
-    hankaku_symbols = '!@#$%&-+='; zenkaku_symbols = '！＠＃＄％＆－＋＝'
-    hankaku_chars = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 ' + hankaku_symbols
-    zenkaku_chars = 'ａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｖｗｘｙｚＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺ０１２３４５６７８９　' + zenkaku_symbols
-    to_zenkaku_all = str.maketrans(hankaku_chars, zenkaku_chars)
-    to_hankaku_time = str.maketrans('０１２３４５６７８９：〜', '0123456789:~')
-    lines = text.strip().split('\n'); start_index = -1
-    time_pattern = r'(\d{2})[:;](\d{2})[:;](\d{2})[;.](\d{2})\s*-\s*(\d{2})[:;](\d{2})[:;](\d{2})[;.](\d{2})'
-    for i, line in enumerate(lines):
-        line_with_frames = re.sub(r'(\d{2}:\d{2}:\d{2})(?![:.]\d{2})', r'\1.00', line)
-        normalized_line = line_with_frames.strip().translate(to_hankaku_time).replace('~', '-')
-        if re.match(time_pattern, normalized_line): start_index = i; break
-    if start_index == -1: return {"narration_script": "エラー：変換可能なタイムコードが見つかりませんでした。", "ai_data": [], "start_times": []}
-    relevant_lines = lines[start_index:]; blocks = []; i = 0
-    while i < len(relevant_lines):
-        current_line = relevant_lines[i].strip()
-        if not current_line: i += 1; continue
-        line_with_frames = re.sub(r'(\d{2}:\d{2}:\d{2})(?![:.]\d{2})', r'\1.00', current_line)
-        normalized_line = line_with_frames.translate(to_hankaku_time).replace('~', '-')
-        if re.match(time_pattern, normalized_line):
-            time_val = current_line; text_lines = []; i += 1
-            while i < len(relevant_lines):
-                if not relevant_lines[i].strip(): break
-                next_line_with_frames = re.sub(r'(\d{2}:\d{2}:\d{2})(?![:.]\d{2})', r'\1.00', relevant_lines[i].strip())
-                next_normalized = next_line_with_frames.translate(to_hankaku_time).replace('~', '-')
-                if re.match(time_pattern, next_normalized): break
-                text_lines.append(relevant_lines[i]); i += 1
-            text_val = "\n".join(text_lines); blocks.append({'time': time_val, 'text': text_val})
-        else: i += 1
-    output_lines = []; narration_blocks_for_ai = []; parsed_blocks = []; block_start_times = []
-    for block in blocks:
-        line_with_frames = re.sub(r'(\d{2}:\d{2}:\d{2})(?![:.]\d{2})', r'\1.00', block['time'])
-        normalized_time_str = line_with_frames.translate(to_hankaku_time).replace('~', '-')
-        time_match = re.match(time_pattern, normalized_time_str)
-        if not time_match: continue
-        groups = time_match.groups()
-        start_hh, start_mm, start_ss, start_fr, end_hh, end_mm, end_ss, end_fr = [int(g or 0) for g in groups]
-        narration_blocks_for_ai.append({'time': block['time'].strip(), 'text': block['text'].strip()})
-        parsed_blocks.append({'start_hh': start_hh, 'start_mm': start_mm, 'start_ss': start_ss, 'start_fr': start_fr,'end_hh': end_hh, 'end_mm': end_mm, 'end_ss': end_ss, 'end_fr': end_fr,'text': block['text']})
-    previous_end_hh = None
-    for i, block in enumerate(parsed_blocks):
-        start_hh, start_mm, start_ss, start_fr = block['start_hh'], block['start_mm'], block['start_ss'], block['start_fr']
-        end_hh, end_mm, end_ss, end_fr = block['end_hh'], block['end_mm'], block['end_ss'], block['end_fr']
-        should_insert_h_marker = False; marker_hh_to_display = -1
-        if i == 0:
-            if start_hh > 0: should_insert_h_marker = True; marker_hh_to_display = start_hh
-            previous_end_hh = end_hh
-        else:
-            if start_hh < end_hh: should_insert_h_marker = True; marker_hh_to_display = end_hh
-            elif previous_end_hh is not None and start_hh > previous_end_hh: should_insert_h_marker = True; marker_hh_to_display = start_hh
-        if should_insert_h_marker: output_lines.append(""); output_lines.append(f"【{str(marker_hh_to_display).translate(to_zenkaku_num)}Ｈ】")
-        previous_end_hh = end_hh
-        total_seconds_in_minute_loop = (start_mm % 60) * 60 + start_ss
-        spacer = ""; is_half_time = False; base_time_str = ""
-        if 0 <= start_fr <= 9:
-            display_mm = (total_seconds_in_minute_loop // 60) % 60; display_ss = total_seconds_in_minute_loop % 60
-            base_time_str = f"{display_mm:02d}{display_ss:02d}"; spacer = "　　　"
-        elif 10 <= start_fr <= 22:
-            display_mm = (total_seconds_in_minute_loop // 60) % 60; display_ss = total_seconds_in_minute_loop % 60
-            base_time_str = f"{display_mm:02d}{display_ss:02d}"; spacer = "　　"; is_half_time = True
-        else:
-            total_seconds_in_minute_loop += 1
-            display_mm = (total_seconds_in_minute_loop // 60) % 60; display_ss = total_seconds_in_minute_loop % 60
-            base_time_str = f"{display_mm:02d}{display_ss:02d}"; spacer = "　　　"
-        colon_time_str = f"{base_time_str[:2]}：{base_time_str[2:]}" if mm_ss_colon_flag else base_time_str
-        formatted_start_time = f"{colon_time_str.translate(to_zenkaku_num)}半" if is_half_time else colon_time_str.translate(to_zenkaku_num)
-        block_start_times.append(formatted_start_time)
-        text_content = block['text'].strip(' \u3000'); speaker_symbol = ''; body = ''
-        if n_force_insert_flag:
-            speaker_symbol = 'Ｎ'
-            n_match = re.match(r'^[\s　]*[NnＮｎ](?:[\s　]*[：:])?(?![A-Za-z0-9])[\s　]*(.*)$', text_content, re.DOTALL)
-            if n_match: body = n_match.group(1)
-            else: body = text_content
-        else: speaker_symbol = ''; body = text_content
-        body = body.strip(' \u3000')
-        if not body: body = "※注意！本文なし！"
-        body = body.translate(to_zenkaku_all)
-        end_string = ""; add_blank_line = True
-        if i + 1 < len(parsed_blocks):
-            next_block = parsed_blocks[i+1]
-            end_total_seconds = (end_hh * 3600) + (end_mm * 60) + end_ss + (end_fr / FRAME_RATE)
-            next_start_total_seconds = (next_block['start_hh'] * 3600) + (next_block['start_mm'] * 60) + next_block['start_ss'] + (next_block['start_fr'] / FRAME_RATE)
-            if next_start_total_seconds - end_total_seconds < CONNECTION_THRESHOLD: add_blank_line = False
-        if add_blank_line:
-            adj_ss = end_ss; adj_mm = end_mm
-            if 0 <= end_fr <= 9: adj_ss = end_ss - 1
-            if adj_ss < 0: adj_ss = 59; adj_mm -= 1
-            adj_mm_display = adj_mm % 60
-            if start_hh != end_hh or (start_mm % 60) != adj_mm_display: formatted_end_time = f"{adj_mm_display:02d}{adj_ss:02d}".translate(to_zenkaku_num)
-            else: formatted_end_time = f"{adj_ss:02d}".translate(to_zenkaku_num)
-            end_string = f" ／{formatted_end_time}"
-        line_prefix = "🔴" if i in highlight_indices else ""
-        body_lines = body.split('\n')
-        first_line_prefix_parts = [formatted_start_time, spacer]
-        if speaker_symbol: first_line_prefix_parts.append(f"{speaker_symbol}　")
-        first_line_prefix = "".join(first_line_prefix_parts)
-        indent_space = '　' * len(first_line_prefix)
-        first_line_text = body_lines[0].lstrip(' \u3000')
-        end_string_for_first_line = end_string if len(body_lines) == 1 else ""
-        output_lines.append(f"{line_prefix}{first_line_prefix}{first_line_text}{end_string_for_first_line}")
-        if len(body_lines) > 1:
-            for k, line_text in enumerate(body_lines[1:]):
-                end_string_for_this_line = end_string if k == len(body_lines) - 2 else ""
-                output_lines.append(f"{indent_space}{line_text.lstrip(' \\u3000')}{end_string_for_this_line}")
-        if add_blank_line and i < len(parsed_blocks) - 1: output_lines.append("")
-    return {"narration_script": "\n".join(output_lines), "ai_data": narration_blocks_for_ai, "start_times": block_start_times}
 
 # ===============================================================
 # ▼▼▼ Streamlit UI（テキストボックスの高さを修正）▼▼▼
@@ -278,7 +25,15 @@ st.caption('　ナレーション原稿作成ツール with gemini(β)')
 GEMINI_API_KEY = st.secrets.get("GEMINI_API_KEY", "")
 if "ai_result_cache" not in st.session_state: st.session_state["ai_result_cache"] = ""
 if "last_input_hash" not in st.session_state: st.session_state["last_input_hash"] = None
+# ブロック本文ごとの校正結果。入力を編集しても、変更のないブロックは再送しない
+if "ai_block_cache" not in st.session_state: st.session_state["ai_block_cache"] = {}
 if "input_text" not in st.session_state: st.session_state["input_text"] = ""
+# XMLのシーケンスごとのテロップ（複数あれば切り替えとZIPダウンロードを出す）
+if "xml_sequences" not in st.session_state: st.session_state["xml_sequences"] = []
+# URLに ?debug=1 を付けると、処理の段階ごとの計測結果とプロファイルの操作を表示する
+debug_mode = st.query_params.get("debug") == "1"
+# SYNCRAFT_LOG_LEVEL=INFO を設定すると、計測結果をJSONの構造化ログとして標準エラーに出す
+if os.environ.get("SYNCRAFT_LOG_LEVEL"): enable_stage_logging(os.environ["SYNCRAFT_LOG_LEVEL"])
 st.markdown("""<style> textarea { font-size: 14px !important; } </style>""", unsafe_allow_html=True)
 placeholder_text = """ここにPremiereのテロップ情報をペーストするか、
 下のボタンからXMLファイルをアップロードしてください。
@@ -301,11 +56,94 @@ help_text = """
 ・サイトでxmlから変換したフォーマットも使えます
 """
 
+@st.cache_resource
+def get_decoded_text_cache():
+    try: return DecodedTextCache(default_decoded_text_cache_path())
+    except (OSError, sqlite3.Error): return None
+
+# この段階が走った実行だけを計測結果として残す（parse は原稿が変わった時だけ）
+PROFILED_STAGES = ("xml_upload", "ai_check", "sequence_zip")
+
+def start_profile_if_requested():
+    # アップロード時のコールバックはスクリプト本体より先に実行されるため、そこからでも開始できるようにする
+    if st.session_state.get("profile_next_run") and "active_profiler" not in st.session_state:
+        profiler = cProfile.Profile(); profiler.enable()
+        st.session_state["active_profiler"] = profiler
+
+def on_profile_toggle():
+    # チェックを入れただけの再実行は何もしないので、前の結果を消して処理が走る実行まで待つ
+    profiler = st.session_state.pop("active_profiler", None)
+    if profiler is not None: profiler.disable()
+    if st.session_state.get("profile_next_run"): st.session_state.pop("profile_result", None)
+
+def is_profiled_run(stage_records):
+    return any(record["stage"] in PROFILED_STAGES or (record["stage"] == "parse" and record.get("input_changed")) for record in stage_records)
+
+def finish_profile(stage_records):
+    profiler = st.session_state.pop("active_profiler", None)
+    if profiler is None: return
+    profiler.disable()
+    # 再描画だけの実行は捨て、チェックは外さずに次の実行をまた計測する
+    if not is_profiled_run(stage_records): return
+    profiler.create_stats()
+    stats_stream = io.StringIO()
+    pstats.Stats(profiler, stream=stats_stream).sort_stats("cumulative").print_stats(40)
+    # .prof ファイルは pstats / snakeviz などでそのまま開ける形式（dump_stats と同じ）
+    st.session_state["profile_result"] = (stats_stream.getvalue(), marshal.dumps(profiler.stats))
+    st.session_state["profile_next_run"] = False
+
+def block_timecodes(parsed_blocks):
+    return {(block.start_hh, block.start_mm, block.start_ss, block.start_fr, block.end_hh, block.end_mm, block.end_ss, block.end_fr) for block in parsed_blocks or []}
+
+def load_sequence(sequence_index):
+    sequence = st.session_state["xml_sequences"][sequence_index]
+    st.session_state.input_text = sequence["caption_text"]
+    # XMLのシーケンスのフレームレートで秒・半秒を判定する（貼り付けたテキストは30fpsとして扱う）
+    # どのテキストに対するフレームレートかが分かるよう、読み込んだ時のタイムコードも覚えておく
+    st.session_state["timebase"] = sequence["rate"].timebase
+    st.session_state["timebase_timecodes"] = block_timecodes(parse_narration_script(sequence["caption_text"]))
+
+def current_timebase(parsed_blocks):
+    """
+    XMLのフレームレートは、そのXMLから読み込んだテキストにだけ使う。
+    本文の手直しや行の削除では変わらないが、読み込んだ時になかったタイムコードが現れたら
+    （別のキャプションを貼り付けた場合など）30fpsとして扱う。
+    """
+    loaded_timecodes = st.session_state.get("timebase_timecodes")
+    if not parsed_blocks or not loaded_timecodes or not block_timecodes(parsed_blocks) <= loaded_timecodes: return DEFAULT_TIMEBASE
+    return st.session_state.get("timebase", DEFAULT_TIMEBASE)
+
 def on_upload_change():
     uploaded_file = st.session_state.get("xml_uploader")
+    # シーケンスごとのZIPは、アップロードし直すたびに作り直す
+    st.session_state.pop("sequence_zip", None)
+    st.session_state["xml_sequences"] = []
     if uploaded_file:
-        with st.spinner("XMLファイルを解析中..."):
-            st.session_state.input_text = parse_premiere_xml(uploaded_file)
+        start_profile_if_requested()
+        # アップロードの計測は次のアップロードまで残し、毎回の再実行の計測と並べて表示する
+        upload_recorder = StageRecorder()
+        text_cache = get_decoded_text_cache()
+        cache_stats = text_cache.stats() if text_cache is not None else {"hits": 0, "misses": 0}
+        with st.spinner("XMLファイルを解析中..."), upload_recorder.stage("xml_upload", input_bytes=uploaded_file.size) as record:
+            # 複数のシーケンスを含むXMLでもタイムラインが混ざらないよう、シーケンスごとに分けて抽出する
+            # Base64のデコードにかかった時間も分けて残し、遅いアップロードがXMLの解析とデコードのどちらによるものか分かるようにする
+            st.session_state["xml_sequences"] = parse_premiere_xml_sequences(uploaded_file, text_cache, scan_stats=record)
+            record["decode_seconds"] = round(record["decode_seconds"], 6)
+            st.session_state["xml_file_stem"] = os.path.splitext(uploaded_file.name)[0]
+            record["sequences"] = len(st.session_state["xml_sequences"])
+            record["caption_chars"] = sum(len(sequence["caption_text"]) for sequence in st.session_state["xml_sequences"])
+            if text_cache is not None:
+                record["text_cache_hits"] = text_cache.stats()["hits"] - cache_stats["hits"]; record["text_cache_misses"] = text_cache.stats()["misses"] - cache_stats["misses"]
+        st.session_state["upload_stage_records"] = upload_recorder.records
+        st.session_state["upload_in_this_run"] = True
+        st.session_state["sequence_index"] = 0
+        load_sequence(0)
+
+def on_sequence_change():
+    load_sequence(st.session_state["sequence_index"])
+
+start_profile_if_requested()
+stage_recorder = StageRecorder()
 
 col1_main, col2_main = st.columns(2)
 with col1_main:
@@ -315,6 +153,15 @@ with col1_main:
         key="xml_uploader",
         on_change=on_upload_change
     )
+    xml_sequences = st.session_state["xml_sequences"]
+    if len(xml_sequences) > 1:
+        st.selectbox(
+            f"シーケンス（{len(xml_sequences)}件）",
+            options=range(len(xml_sequences)),
+            format_func=lambda i: f"{xml_sequences[i]['name']}（{xml_sequences[i]['rate'].label}）",
+            key="sequence_index",
+            on_change=on_sequence_change
+        )
     st.text_area(
         "　ここに元原稿をペーストするか、上記からXMLをアップロードしてください。", 
         height=500, # <-- 高さを500pxに修正
@@ -338,49 +185,108 @@ current_input = st.session_state.get("input_text", "")
 with col2_main:
     if current_input:
         try:
-            initial_result = convert_narration_script(current_input, n_force_insert, mm_ss_colon)
-            narration_script = initial_result["narration_script"]
-            if narration_script.strip().startswith("エラー："):
-                 st.text_area("変換結果", value=narration_script, height=500)
+            # 編集された段落だけを解析し直し、チェックボックスの切り替えでは描画だけをやり直す
+            if "narration_converter" not in st.session_state: st.session_state["narration_converter"] = IncrementalNarrationConverter()
+            narration_converter = st.session_state["narration_converter"]
+            with stage_recorder.stage("parse", input_chars=len(current_input)) as record:
+                parsed_blocks = narration_converter.parse(current_input)
+                record["blocks"] = len(parsed_blocks) if parsed_blocks else 0
+                record["input_changed"] = current_input != st.session_state.get("last_parsed_input")
+                st.session_state["last_parsed_input"] = current_input
+            timebase = current_timebase(parsed_blocks)
+            if parsed_blocks is None:
+                 st.text_area("変換結果", value=narration_converter.render(parsed_blocks)["narration_script"], height=500)
             else:
-                ai_data = initial_result["ai_data"]
-                block_start_times = initial_result["start_times"]
-                highlight_indices = set()
-                ai_display_text = ""
-                if ai_check_flag:
-                    with st.spinner("Geminiが誤字脱字をチェック中...数分お待ちください🙇"):
-                        if not st.session_state.get("ai_result_cache"):
-                            ai_result_md = check_narration_with_gemini(ai_data, GEMINI_API_KEY)
-                            st.session_state["ai_result_cache"] = ai_result_md
-                    ai_result_md = st.session_state.get("ai_result_cache", "")
-                    if ai_result_md and "問題ありませんでした" not in ai_result_md:
-                        new_table_header = "| タイム | 修正提案 | 理由 |\n|---|---|---|"
-                        new_table_rows = []
-                        for line in ai_result_md.splitlines():
-                            if line.strip().startswith('|') and '---' not in line and 'No.' not in line:
-                                try:
-                                    parts = [p.strip() for p in line.strip().strip('|').split('|')]
-                                    num_str, suggestion, reason = parts[0], parts[1], parts[2]
-                                    index = int(re.search(r'\d+', num_str).group()) - 1
-                                    if 0 <= index < len(block_start_times):
-                                        highlight_indices.add(index)
-                                        start_time = block_start_times[index]
-                                        new_table_rows.append(f"| {start_time} | {suggestion} | {reason} |")
-                                except (ValueError, IndexError): continue
-                        if new_table_rows: ai_display_text = new_table_header + "\n" + "\n".join(new_table_rows)
-                        else: ai_display_text = "AIによる指摘事項はありませんでした。"
-                    else: ai_display_text = ai_result_md
-                final_result = convert_narration_script(current_input, n_force_insert, mm_ss_colon, highlight_indices)
-                st.text_area("　変換完了！コピーしてお使いください", value=final_result["narration_script"], height=500)
-                if ai_check_flag and ai_display_text:
-                    st.markdown("---")
-                    st.subheader("📝 AI校正チェック結果")
-                    st.markdown(ai_display_text)
+                # 原稿全体の文字列は作らず、ブロックごとの描画結果から表示中のページとダウンロード用のデータを組み立てる
+                with stage_recorder.stage("render", blocks=len(parsed_blocks), timebase=timebase):
+                    initial_fragments = narration_converter.render_fragments(parsed_blocks, n_force_insert, mm_ss_colon, timebase=timebase)
+                ai_data = narration_ai_data(parsed_blocks)
+                block_start_times = [fragment[1] for fragment in initial_fragments]
+
+                # 長い番組でも毎回すべてをブラウザに送らないよう、【ＮＨ】の仕切りごとのページに分けて1ページずつ表示する
+                pages = narration_page_ranges(parsed_blocks)
+                page_index = 0
+                if len(pages) > 1:
+                    if st.session_state.get("output_page", 0) >= len(pages): st.session_state["output_page"] = 0
+                    cached_highlights, _, _ = build_ai_check_display(st.session_state.get("ai_result_cache", "") if ai_check_flag else "", block_start_times)
+                    def format_page(i):
+                        label, page_start, page_end = pages[i]
+                        highlighted_count = sum(1 for index in cached_highlights if page_start <= index < page_end)
+                        return f"{label}（{page_end - page_start}ブロック）" + (f" 🔴×{highlighted_count}" if highlighted_count else "")
+                    page_index = st.selectbox("表示するページ", options=range(len(pages)), format_func=format_page, key="output_page")
+                _, page_start, page_end = pages[page_index]
+                output_placeholder = st.empty()
+                download_placeholder = st.empty()
+                ai_check_placeholder = st.empty()
+
+                def show_results(ai_result_md, output_key=None, progress_text=""):
+                    highlight_indices, ai_display_text, ai_errors = build_ai_check_display(ai_result_md, block_start_times)
+                    # チェック途中は、まだ指摘がなくても「問題なし」とは表示しない
+                    if progress_text and not highlight_indices: ai_display_text = ""
+                    if highlight_indices:
+                        # 🔴を付けるための2回目の描画
+                        with stage_recorder.stage("render_highlighted", blocks=len(parsed_blocks), highlighted=len(highlight_indices)):
+                            fragments = narration_converter.render_fragments(parsed_blocks, n_force_insert, mm_ss_colon, highlight_indices, timebase)
+                    else: fragments = initial_fragments
+                    with stage_recorder.stage("page_text", blocks=page_end - page_start) as record:
+                        page_text = join_fragment_lines(fragments, page_start, page_end)
+                        record["output_chars"] = len(page_text)
+                    output_label = "　変換完了！コピーしてお使いください" + (f"（{pages[page_index][0]}のページ）" if len(pages) > 1 else "")
+                    output_placeholder.text_area(output_label, value=page_text, height=500, key=output_key)
+                    if ai_check_flag and (ai_display_text or progress_text or ai_errors):
+                        with ai_check_placeholder.container():
+                            st.markdown("---")
+                            st.subheader("📝 AI校正チェック結果")
+                            if progress_text: st.caption(progress_text)
+                            if ai_display_text: st.markdown(ai_display_text)
+                            # チェックできなかったブロックがあることを、指摘テーブルの下に必ず出す
+                            for ai_error in ai_errors: st.error(ai_error)
+                    return highlight_indices, fragments
+
+                ai_result_md = st.session_state.get("ai_result_cache", "") if ai_check_flag else ""
+                if ai_check_flag and not ai_result_md:
+                    # チャンクが終わるたびに🔴と指摘テーブルを更新する
+                    # 途中経過の表示は毎回別のウィジェットになるよう、キーを変えて描画する
+                    with st.spinner("Geminiが誤字脱字をチェック中...🙇"), stage_recorder.stage("ai_check") as record:
+                        for step, (ai_result_md, completed_chunks, total_chunks) in enumerate(iter_narration_check_results(ai_data, GEMINI_API_KEY, st.session_state["ai_block_cache"], check_stats=record)):
+                            if total_chunks: show_results(ai_result_md, f"narration_output_progress_{step}", f"チェック中... {completed_chunks}/{total_chunks}")
+                    # 失敗したチャンクがある結果は残さず、次の実行でそのブロックだけを送り直す（成功分はブロックのキャッシュから出る）
+                    if not record.get("failed_chunks"): st.session_state["ai_result_cache"] = ai_result_md
+                highlight_indices, fragments = show_results(ai_result_md)
+
+                # ダウンロード用のデータは、入力・オプション・🔴が変わった時だけブロックごとに書き出して作り直す
+                download_key = (hash(current_input), n_force_insert, mm_ss_colon, timebase, frozenset(highlight_indices))
+                if st.session_state.get("script_download", (None,))[0] != download_key:
+                    with stage_recorder.stage("script_download", blocks=len(fragments)) as record:
+                        download_buffer = io.BytesIO()
+                        for chunk in iter_narration_script_chunks(fragments): download_buffer.write(chunk.encode("utf-8"))
+                        st.session_state["script_download"] = (download_key, download_buffer.getvalue())
+                        record["output_bytes"] = len(st.session_state["script_download"][1])
+                download_placeholder.download_button(
+                    "原稿をダウンロード (.txt)",
+                    data=st.session_state["script_download"][1],
+                    file_name=f"{st.session_state.get('xml_file_stem', 'syncraft')}_narration.txt",
+                    mime="text/plain"
+                )
         except Exception as e:
             st.error(f"変換処理中に予期せぬエラーが発生しました: {e}")
             st.text_area("変換結果", value="", height=500, disabled=True)
     else:
         st.markdown('<div style="height: 500px;"></div>', unsafe_allow_html=True)
+
+if len(st.session_state["xml_sequences"]) > 1:
+    # 全シーケンスを並列に変換してZIPにまとめる。オプションが変わった時だけ作り直す
+    zip_key = (n_force_insert, mm_ss_colon)
+    if st.session_state.get("sequence_zip", (None,))[0] != zip_key:
+        with st.spinner("全シーケンスを変換中..."), stage_recorder.stage("sequence_zip", sequences=len(st.session_state["xml_sequences"])):
+            converted_sequences = convert_premiere_sequences(st.session_state["xml_sequences"], n_force_insert, mm_ss_colon)
+            st.session_state["sequence_zip"] = (zip_key, build_sequence_scripts_zip(converted_sequences))
+    st.download_button(
+        "全シーケンスの原稿をZIPでダウンロード",
+        data=st.session_state["sequence_zip"][1],
+        file_name=f"{st.session_state.get('xml_file_stem', 'syncraft')}_narration.zip",
+        mime="application/zip"
+    )
             
 st.markdown("---")
 st.markdown(
@@ -392,3 +298,19 @@ st.markdown(
     unsafe_allow_html=True
 )
 st.markdown('<div style="height: 200px;"></div>', unsafe_allow_html=True)
+
+# アップロードの計測はコールバック側で取っているので、今回の実行の分と合わせて判定する
+finish_profile(stage_recorder.records + (st.session_state["upload_stage_records"] if st.session_state.pop("upload_in_this_run", False) else []))
+if debug_mode:
+    with st.expander("🛠 計測（デバッグ）", expanded=True):
+        if st.session_state.get("upload_stage_records"):
+            st.caption("直近のXMLアップロード")
+            st.table(st.session_state["upload_stage_records"])
+        st.caption("今回の実行")
+        if stage_recorder.records: st.table(stage_recorder.records)
+        st.checkbox("次にXMLの読み込み・原稿の変更・AIチェックをした実行をcProfileで計測する", key="profile_next_run", on_change=on_profile_toggle)
+        if st.session_state.get("profile_next_run"): st.caption("計測待ち：XMLの読み込み・原稿の変更・AIチェックのいずれかを行うと計測します")
+        if "profile_result" in st.session_state:
+            profile_text, profile_data = st.session_state["profile_result"]
+            st.download_button("プロファイル (.prof) をダウンロード", data=profile_data, file_name="syncraft.prof", mime="application/octet-stream")
+            st.code(profile_text)
@@ -0,0 +1,259 @@
+# ===========================================
+# Syncraft bench - 主要な処理の速度・メモリを合成データで計測する
+# 使い方: python syncraft_bench.py [--size medium] [--save-baseline] [--threshold 0.3]
+# 合成データは乱数のシードを固定して作るため、同じ設定なら毎回同じ入力になる
+# ===========================================
+
+import argparse
+import base64
+import io
+import json
+import os
+import platform
+import random
+import struct
+import sys
+import timeit
+import tracemalloc
+import uuid
+
+from syncraft_core import TimecodeRate, convert_narration_script, decode_premiere_text, frames_to_df_timecode, frames_to_timecodes, parse_premiere_xml
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "syncraft_bench_baseline.json")
+# 1組の計測にかける最短の時間（秒）。timeit.Timer.autorange と同じ0.2秒を既定にする
+DEFAULT_MIN_SECONDS = 0.2
+# ベースラインより遅かったステージを測り直す回数
+RECHECK_ROUNDS = 2
+# 規模ごとの件数（clips: XMLのclipitem数、blocks: キャプションテキストのブロック数、frames: タイムコード化するフレーム数）
+SIZES = {
+    "small": {"sequences": 1, "clips": 200, "blocks": 200, "frames": 10000},
+    "medium": {"sequences": 3, "clips": 2000, "blocks": 2000, "frames": 100000},
+    "large": {"sequences": 10, "clips": 20000, "blocks": 20000, "frames": 1000000},
+}
+
+# テロップ本文の素材。半角英数字の全角化や「Ｎ」の挿入判定も通るよう、英数字や記号を混ぜておく
+CAPTION_PHRASES = [
+    "今日のテーマは", "2025年の大会で", "およそ300人が", "集まりました", "ＶＴＲをご覧ください", "Nそして", "ここからが本番です",
+    "AIを活用した", "新しい取り組みが", "始まっています", "（拍手）", "その理由とは？", "駅から徒歩5分", "Q&Aコーナー",
+]
+# Premiereのソーステキストは、フォント名や書式のバイナリの後ろにUTF-8の本文が続く
+FONT_NAMES = [b"KozGoPr6N-Medium", b"HiraginoSans-W6", b"YuGothic-Bold", b"NotoSansCJKjp-Regular"]
+
+
+# ===============================================================
+# ▼▼▼ 合成データの生成 ▼▼▼
+# ===============================================================
+
+def make_caption_phrase(rnd, lines):
+    return "\n".join("".join(rnd.choice(CAPTION_PHRASES) for _ in range(rnd.randint(1, 3))) for _ in range(lines))
+
+def make_premiere_text_payload(text, rnd):
+    """本文をPremiereのソーステキストに近い形（書式のバイナリ＋UTF-8本文）にしてBase64で返す。"""
+    header = bytearray()
+    header += struct.pack("<IIf", rnd.randint(1, 8), rnd.randint(0, 4), rnd.uniform(24.0, 96.0))
+    font_name = rnd.choice(FONT_NAMES)
+    header += struct.pack("<H", len(font_name)) + font_name
+    header += bytes(rnd.randrange(256) for _ in range(rnd.randint(64, 256)))
+    # 本文の直前は必ずUTF-8として不正なバイトにし、デコード結果が本文と一致するようにする
+    header += bytes([rnd.randint(0xF8, 0xFF)])
+    return base64.b64encode(bytes(header) + text.encode("utf-8")).decode("ascii")
+
+def make_sequence_xml(clips=2000, sequences=1, timebase=30, ntsc=True, repeat_ratio=0.2, seed=0):
+    """
+    PremiereのシーケンスXML（xmeml）に近い合成データを返す（bytes）。
+    clipitemを sequences 個のシーケンスに振り分け、repeat_ratio の割合で同じテロップ（同じhash）を使い回す。
+    """
+    rnd = random.Random(seed)
+    used_texts = []
+    parts = ["<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<!DOCTYPE xmeml>\n<xmeml version=\"4\"><project><name>bench</name><children>"]
+    display_format = "DF" if ntsc and timebase in (30, 60) else "NDF"
+    clips_per_sequence = [clips // sequences + (1 if i < clips % sequences else 0) for i in range(sequences)]
+    for sequence_index, sequence_clips in enumerate(clips_per_sequence):
+        parts.append(
+            f"<sequence id=\"sequence-{sequence_index + 1}\"><name>シーケンス {sequence_index + 1:02d}</name><duration>{sequence_clips * 120}</duration>"
+            f"<rate><timebase>{timebase}</timebase><ntsc>{'TRUE' if ntsc else 'FALSE'}</ntsc></rate>"
+            f"<timecode><rate><timebase>{timebase}</timebase><ntsc>{'TRUE' if ntsc else 'FALSE'}</ntsc></rate><string>00;00;00;00</string><frame>0</frame><displayformat>{display_format}</displayformat></timecode>"
+            "<media><video><track>"
+        )
+        frame = 0
+        for _ in range(sequence_clips):
+            frame += rnd.randint(0, timebase * 4)
+            duration = rnd.randint(timebase, timebase * 8)
+            if used_texts and rnd.random() < repeat_ratio: text_hash, payload = rnd.choice(used_texts)
+            else:
+                text_hash = str(uuid.UUID(int=rnd.getrandbits(128)))
+                payload = make_premiere_text_payload(make_caption_phrase(rnd, rnd.randint(1, 2)), rnd)
+                used_texts.append((text_hash, payload))
+            parts.append(
+                f"<clipitem id=\"clipitem-{len(used_texts)}-{frame}\"><name>グラフィック</name><enabled>TRUE</enabled><duration>{duration}</duration>"
+                f"<rate><timebase>{timebase}</timebase><ntsc>{'TRUE' if ntsc else 'FALSE'}</ntsc></rate><start>{frame}</start><end>{frame + duration}</end><in>0</in><out>{duration}</out>"
+                "<filter><effect><name>グラフィック</name><effectid>GraphicAndType</effectid><effectcategory>graphic</effectcategory><effecttype>filter</effecttype><mediatype>video</mediatype>"
+                f"<parameter authoringApp=\"PremierePro\"><parameterid>1</parameterid><name>Source Text</name><hash>{text_hash}</hash><value>{payload}</value></parameter>"
+                "<parameter authoringApp=\"PremierePro\"><parameterid>2</parameterid><name>Transform</name><value>0</value></parameter>"
+                "</effect></filter></clipitem>"
+            )
+            frame += duration
+        parts.append("</track></video></media></sequence>")
+    parts.append("</children></project></xmeml>\n")
+    return "".join(parts).encode("utf-8")
+
+def make_caption_text(blocks=2000, lines_per_block=2, hour_crossings=2, half_second_ratio=0.3, timebase=30, seed=0):
+    """
+    Premiereのキャプション書き出しに近い「開始 - 終了」＋本文のテキストを返す。
+    hour_crossings 回だけ時（hh）の変わり目をまたぎ、half_second_ratio の割合のブロックは開始が半秒（15フレーム付近）になる。
+    """
+    rnd = random.Random(seed)
+    # 時の変わり目をまたぐブロックを、全体に均等に散らしておく
+    crossing_blocks = {blocks * (i + 1) // (hour_crossings + 1) for i in range(hour_crossings)} if blocks else set()
+    frame = 0; output_blocks = []
+    for i in range(blocks):
+        if i in crossing_blocks: frame = (frame // (timebase * 3600) + 1) * timebase * 3600 - rnd.randint(0, timebase * 2)
+        else: frame += rnd.randint(0, timebase * 4)
+        # 開始フレームの端数を、半秒になる範囲・ならない範囲のどちらかに寄せる
+        second_start = frame - frame % timebase
+        if rnd.random() < half_second_ratio: frame = second_start + timebase // 2
+        else: frame = second_start + rnd.choice((0, 1, 2, timebase - 3, timebase - 2, timebase - 1))
+        duration = rnd.randint(timebase, timebase * 8)
+        output_blocks.append(f"{format_frames(frame, timebase)} - {format_frames(frame + duration, timebase)}\n{make_caption_phrase(rnd, lines_per_block)}")
+        frame += duration
+    return "\n\n".join(output_blocks)
+
+def format_frames(total_frames, timebase):
+    total_seconds, ff = divmod(total_frames, timebase)
+    total_minutes, ss = divmod(total_seconds, 60)
+    hh, mm = divmod(total_minutes, 60)
+    return f"{hh:02d};{mm:02d};{ss:02d};{ff:02d}"
+
+def make_frame_counts(count, seed=0):
+    rnd = random.Random(seed)
+    # 番組尺（数時間）に収まるフレーム数を、並び順もばらばらに用意する
+    return [rnd.randrange(30 * 3600 * 4) for _ in range(count)]
+
+
+# ===============================================================
+# ▼▼▼ 計測 ▼▼▼
+# ===============================================================
+
+def build_stages(size):
+    """規模に応じた入力を作り、(ステージ名, 入力の説明, 計測する関数) のリストを返す。"""
+    config = SIZES[size]
+    xml_bytes = make_sequence_xml(config["clips"], config["sequences"])
+    payload_rnd = random.Random(1)
+    payloads = [make_premiere_text_payload(make_caption_phrase(payload_rnd, 2), payload_rnd) for _ in range(config["clips"])]
+    caption_text = make_caption_text(config["blocks"], hour_crossings=max(1, config["blocks"] // 500))
+    frame_counts = make_frame_counts(config["frames"])
+    rate = TimecodeRate.from_fps(29.97)
+    return [
+        ("decode_premiere_text", f"{len(payloads)}件", lambda: [decode_premiere_text(payload) for payload in payloads]),
+        ("parse_premiere_xml", f"{len(xml_bytes) / 1024 / 1024:.1f}MiB", lambda: parse_premiere_xml(io.BytesIO(xml_bytes))),
+        ("frames_to_df_timecode", f"{len(frame_counts)}件", lambda: [frames_to_df_timecode(total_frames) for total_frames in frame_counts]),
+        ("frames_to_timecodes", f"{len(frame_counts)}件", lambda: frames_to_timecodes(frame_counts, rate)),
+        ("convert_narration_script", f"{config['blocks']}ブロック", lambda: convert_narration_script(caption_text)),
+    ]
+
+def measure(stage_function, repeat, min_seconds=DEFAULT_MIN_SECONDS):
+    """
+    1回あたりの実行時間（秒）と、1回分の実行中に確保したメモリのピーク（バイト）を返す。
+    数msで終わるステージは1回ずつ測るとゆらぎに埋もれるため、min_seconds 以上かかる回数をまとめて実行し、
+    その平均を repeat 組測ったうちの最速を採用する。戻り値の3つめはまとめて実行した回数。
+    """
+    stage_function()  # 初回だけ発生する正規表現のコンパイルやimportを計測から外す
+    timer = timeit.Timer(stage_function)
+    # timeit.Timer.autorange と同じく 1, 2, 5, 10, 20, ... 回と増やし、min_seconds に届く回数を探す
+    number = 1
+    for number in (multiplier * 10 ** power for power in range(10) for multiplier in (1, 2, 5)):
+        if timer.timeit(number) >= min_seconds: break
+    best_seconds = min(timer.repeat(repeat, number)) / number
+    # tracemallocは処理を遅くするため、時間とは別に1回だけ測る
+    tracemalloc.start()
+    try:
+        stage_function()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best_seconds, peak_bytes, number
+
+def load_baseline(path):
+    try:
+        with open(path, encoding="utf-8") as f: return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def find_regressions(results, baseline_results, threshold):
+    """ベースラインより threshold の割合を超えて遅い・メモリが多いステージを「ステージ名: 内容」のリストで返す。"""
+    regressions = []
+    for stage, result in results.items():
+        base = baseline_results.get(stage)
+        if not base: continue
+        if result["seconds"] > base["seconds"] * (1 + threshold):
+            regressions.append(f"{stage}: 1回あたりの時間 {base['seconds'] * 1000:.3f}ms → {result['seconds'] * 1000:.3f}ms")
+        if result["peak_bytes"] > base["peak_bytes"] * (1 + threshold):
+            regressions.append(f"{stage}: メモリ {base['peak_bytes'] / 1024:.0f}KiB → {result['peak_bytes'] / 1024:.0f}KiB")
+    return regressions
+
+def write_samples(output_dir, size):
+    """ベンチマークと同じ合成データをファイルに書き出す（アプリやCLIで手動確認する用）。"""
+    config = SIZES[size]
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, f"bench_{size}.xml"), "wb") as f: f.write(make_sequence_xml(config["clips"], config["sequences"]))
+    with open(os.path.join(output_dir, f"bench_{size}.txt"), "w", encoding="utf-8") as f: f.write(make_caption_text(config["blocks"], hour_crossings=max(1, config["blocks"] // 500)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合成データで主要な処理の速度・メモリを計測し、ベースラインと比べる")
+    parser.add_argument("--size", choices=sorted(SIZES), default="medium", help="合成データの規模（既定: medium）")
+    parser.add_argument("--repeat", type=int, default=5, help="各ステージの計測を繰り返す組数。最速の組を採用する（既定: 5）")
+    parser.add_argument("--min-seconds", type=float, default=DEFAULT_MIN_SECONDS, help="1組の計測にかける最短の時間。短いステージは何回かまとめて実行する（既定: %(default)s秒）")
+    parser.add_argument("--stage", action="append", help="計測するステージ（複数指定可。既定: すべて）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="ベースラインのJSONファイル")
+    parser.add_argument("--save-baseline", action="store_true", help="今回の結果をベースラインとして保存する")
+    parser.add_argument("--threshold", type=float, default=0.3, help="ベースラインからの悪化を回帰とみなす割合（既定: 0.3 = 30%%）")
+    parser.add_argument("--write-samples", metavar="DIR", help="計測せず、合成データをフォルダに書き出す")
+    args = parser.parse_args(argv)
+
+    if args.write_samples:
+        write_samples(args.write_samples, args.size); return 0
+
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    print(f"Python {platform.python_version()} / NumPy {numpy_version or 'なし'} / 規模 {args.size}")
+
+    results = {}; stage_functions = {}
+    for stage, description, stage_function in build_stages(args.size):
+        if args.stage and stage not in args.stage: continue
+        stage_functions[stage] = stage_function
+        seconds, peak_bytes, number = measure(stage_function, args.repeat, args.min_seconds)
+        results[stage] = {"seconds": round(seconds, 7), "peak_bytes": peak_bytes}
+        print(f"{stage:<26} {description:>12} {seconds * 1000:10.3f}ms/回 ×{number:<4} {peak_bytes / 1024:10.0f}KiB")
+
+    baseline = load_baseline(args.baseline)
+    # ベースラインは計測した環境に依存するため、規模ごとに環境の情報と一緒に保存する
+    if args.save_baseline:
+        baseline[args.size] = {"python": platform.python_version(), "numpy": numpy_version, "machine": platform.machine(), "stages": results}
+        with open(args.baseline, "w", encoding="utf-8") as f: json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True); f.write("\n")
+        print(f"ベースラインを保存しました: {args.baseline}")
+        return 0
+
+    if args.size not in baseline:
+        print("この規模のベースラインがありません（--save-baseline で保存できます）")
+        return 0
+    baseline_results = baseline[args.size]["stages"]
+    # 一時的な負荷で遅く見えただけのステージを回帰としないよう、遅かったステージは測り直して速い方を採る
+    for _ in range(RECHECK_ROUNDS):
+        slow_stages = [stage for stage, result in results.items() if stage in baseline_results and result["seconds"] > baseline_results[stage]["seconds"] * (1 + args.threshold)]
+        if not slow_stages: break
+        for stage in slow_stages:
+            seconds, _, number = measure(stage_functions[stage], args.repeat, args.min_seconds)
+            results[stage]["seconds"] = round(min(results[stage]["seconds"], seconds), 7)
+            print(f"{stage:<26} {'（再計測）':>12} {seconds * 1000:10.3f}ms/回 ×{number:<4}")
+    regressions = find_regressions(results, baseline_results, args.threshold)
+    for regression in regressions: print(f"回帰: {regression}")
+    if not regressions: print(f"ベースラインからの悪化はありません（閾値 {args.threshold:.0%}）")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
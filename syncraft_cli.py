@@ -0,0 +1,152 @@
+# ===========================================
+# Syncraft CLI - フォルダ内のXML・キャプションテキストを一括でナレーション原稿に変換する
+# 使い方: python syncraft_cli.py 入力フォルダ 出力フォルダ [--jobs 4] [--split-sequences]
+# ===========================================
+
+import argparse
+import csv
+import functools
+from collections import Counter
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from syncraft_core import (
+    DEFAULT_TIMEBASE, DecodedTextCache, convert_narration_script, convert_premiere_sequence, default_decoded_text_cache_path,
+    parse_premiere_xml, parse_premiere_xml_sequences, sequence_script_filename,
+)
+
+INPUT_EXTENSIONS = ('.xml', '.txt')
+TIMING_FIELDS = ["file", "status", "input_bytes", "rate", "blocks", "xml_seconds", "convert_seconds", "total_seconds", "output"]
+
+# ワーカープロセスごとに1つだけ開くデコード結果のキャッシュ（開けなかった場合は False）
+_worker_text_cache = None
+
+def get_worker_text_cache():
+    """キャッシュを開けない場合は（アプリと同じく）None を返し、キャッシュなしで変換を続ける。"""
+    global _worker_text_cache
+    if _worker_text_cache is None:
+        try: _worker_text_cache = DecodedTextCache(default_decoded_text_cache_path())
+        except (OSError, sqlite3.Error) as e:
+            print(f"テキストのキャッシュを開けないため、キャッシュなしで変換します: {e}", file=sys.stderr)
+            _worker_text_cache = False
+    return _worker_text_cache or None
+
+
+def output_stems(input_paths):
+    """
+    出力ファイル名の元にする名前（拡張子を除いたファイル名）を input_paths の順に返す。
+    foo.xml と foo.txt のように拡張子だけが違うファイルは、互いに上書きしないよう拡張子も残す（foo_xml, foo_txt）。
+    大文字・小文字を区別しないファイルシステムでもぶつからないよう、比較は小文字で行う。
+    """
+    stems = [os.path.splitext(os.path.basename(input_path))[0] for input_path in input_paths]
+    stem_counts = Counter(stem.lower() for stem in stems)
+    return [stem if stem_counts[stem.lower()] == 1 else stem + "_" + os.path.splitext(input_path)[1].lstrip('.') for stem, input_path in zip(stems, input_paths)]
+
+
+def convert_file(input_path, output_dir, n_force_insert_flag=True, mm_ss_colon_flag=False, use_text_cache=False, split_sequences=False, output_stem=None):
+    """
+    1ファイルを変換して出力フォルダに「元のファイル名_narration.txt」として書き出し、計測結果を返す。
+    split_sequences を指定すると、XMLはシーケンスごとに「元のファイル名_番号_シーケンス名_narration.txt」に分けて書き出す。
+    output_stem を渡すと「元のファイル名」の代わりに使う（output_stems を参照）。
+    ワーカープロセスで実行されるため、例外は外に出さず status に記録する。
+    """
+    started = time.perf_counter()
+    if output_stem is None: output_stem = os.path.splitext(os.path.basename(input_path))[0]
+    record = {"file": os.path.basename(input_path), "status": "ok", "input_bytes": os.path.getsize(input_path), "rate": "", "blocks": 0, "xml_seconds": 0.0, "convert_seconds": 0.0, "total_seconds": 0.0, "output": ""}
+    timebase = DEFAULT_TIMEBASE
+    try:
+        if split_sequences and input_path.lower().endswith('.xml'):
+            return convert_xml_sequences(input_path, output_dir, record, n_force_insert_flag, mm_ss_colon_flag, use_text_cache, output_stem)
+        if input_path.lower().endswith('.xml'):
+            stage_started = time.perf_counter()
+            sequence_info = {}
+            with open(input_path, 'rb') as f: caption_text = parse_premiere_xml(f, get_worker_text_cache() if use_text_cache else None, sequence_info)
+            record["xml_seconds"] = time.perf_counter() - stage_started
+            if "rate" in sequence_info: record["rate"] = sequence_info["rate"].label; timebase = sequence_info["rate"].timebase
+            if caption_text.startswith(("エラー：", "予期せぬエラー")):
+                record["status"] = caption_text; return record
+        else:
+            with open(input_path, encoding='utf-8-sig') as f: caption_text = f.read()
+
+        stage_started = time.perf_counter()
+        result = convert_narration_script(caption_text, n_force_insert_flag, mm_ss_colon_flag, timebase=timebase)
+        record["convert_seconds"] = time.perf_counter() - stage_started
+        record["blocks"] = len(result["start_times"])
+        if result["narration_script"].startswith("エラー："):
+            record["status"] = result["narration_script"]; return record
+
+        output_path = os.path.join(output_dir, output_stem + "_narration.txt")
+        with open(output_path, 'w', encoding='utf-8') as f: f.write(result["narration_script"])
+        record["output"] = os.path.basename(output_path)
+    except Exception as e:
+        record["status"] = f"予期せぬエラー: {e}"
+    finally:
+        record["total_seconds"] = time.perf_counter() - started
+    return record
+
+
+def convert_xml_sequences(input_path, output_dir, record, n_force_insert_flag, mm_ss_colon_flag, use_text_cache, output_stem):
+    """convert_file の --split-sequences 版。ファイル単位で並列化しているため、シーケンスはこのプロセス内で順に変換する。"""
+    stage_started = time.perf_counter()
+    with open(input_path, 'rb') as f: sequences = parse_premiere_xml_sequences(f, get_worker_text_cache() if use_text_cache else None)
+    record["xml_seconds"] = time.perf_counter() - stage_started
+    record["rate"] = "/".join(dict.fromkeys(sequence["rate"].label for sequence in sequences if not sequence["caption_text"].startswith(("エラー：", "予期せぬエラー"))))
+
+    stage_started = time.perf_counter()
+    output_names = []; errors = []
+    for i, sequence in enumerate(sequences):
+        converted = convert_premiere_sequence(sequence, n_force_insert_flag, mm_ss_colon_flag)
+        record["blocks"] += converted["blocks"]
+        if converted["narration_script"].startswith(("エラー：", "予期せぬエラー")):
+            errors.append(f"{sequence['name']}: {converted['narration_script']}" if sequence["name"] else converted["narration_script"]); continue
+        output_name = output_stem + "_" + sequence_script_filename(i, sequence["name"])
+        with open(os.path.join(output_dir, output_name), 'w', encoding='utf-8') as f: f.write(converted["narration_script"])
+        output_names.append(output_name)
+    record["convert_seconds"] = time.perf_counter() - stage_started
+    record["output"] = ";".join(output_names)
+    if errors: record["status"] = " / ".join(errors)
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PremiereのシーケンスXML・キャプションテキストを一括でナレーション原稿に変換する")
+    parser.add_argument("input_dir", help="変換する .xml / .txt が入ったフォルダ")
+    parser.add_argument("output_dir", help="原稿と timings.csv の出力先フォルダ")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="並列に変換するプロセス数（既定: CPUコア数）")
+    parser.add_argument("--no-n-force", action="store_true", help="本文頭に「Ｎ」を自動挿入しない")
+    parser.add_argument("--colon", action="store_true", help="タイムを ｍｍ：ｓｓ 形式にする")
+    parser.add_argument("--text-cache", action="store_true", help="XMLのテキストのデコード結果をディスクにキャッシュする")
+    parser.add_argument("--split-sequences", action="store_true", help="XMLをシーケンスごとに別々の原稿として書き出す")
+    args = parser.parse_args(argv)
+
+    input_paths = sorted(
+        os.path.join(args.input_dir, name) for name in os.listdir(args.input_dir)
+        if name.lower().endswith(INPUT_EXTENSIONS) and os.path.isfile(os.path.join(args.input_dir, name))
+    )
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    convert = functools.partial(convert_file, output_dir=args.output_dir, n_force_insert_flag=not args.no_n_force, mm_ss_colon_flag=args.colon, use_text_cache=args.text_cache, split_sequences=args.split_sequences)
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [executor.submit(convert, input_path, output_stem=output_stem) for input_path, output_stem in zip(input_paths, output_stems(input_paths))]
+        records = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    with open(os.path.join(args.output_dir, "timings.csv"), 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=TIMING_FIELDS)
+        writer.writeheader()
+        for record in records:
+            writer.writerow({key: f"{value:.4f}" if isinstance(value, float) else value for key, value in record.items()})
+
+    for record in records:
+        print(f"{record['file']}: {record['status']} ({record['blocks']}ブロック, {record['total_seconds']:.2f}秒)")
+    failed = sum(1 for record in records if record["status"] != "ok")
+    print(f"{len(records)}ファイル中 {len(records) - failed}件成功 / 合計 {elapsed:.2f}秒")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
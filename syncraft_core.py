@@ -0,0 +1,957 @@
+# ===========================================
+# Syncraft core - 原稿変換ライブラリ
+# Streamlit を使わずに import できるよう、UI 以外の処理をまとめたもの
+# google-genai は Gemini でチェックする時にだけ読み込む
+# ===========================================
+
+import re
+import sys
+import xml.etree.ElementTree as ET
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+
+# ===============================================================
+# ▼▼▼ 計測関連 ▼▼▼
+# ===============================================================
+
+stage_logger = logging.getLogger("syncraft")
+
+class StageRecorder:
+    """
+    処理の段階ごとに、所要時間と付随する情報（入力サイズ・ブロック数・キャッシュのヒット数など）を記録する。
+    記録は records に辞書で溜め、1件ごとに "syncraft" ロガーへJSON文字列としてINFOで出力する。
+    """
+    def __init__(self):
+        self.records = []
+
+    @contextmanager
+    def stage(self, name, **fields):
+        """with の中で返した辞書に項目を追加すると、それも一緒に記録する。"""
+        record = {"stage": name, **fields}
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(time.perf_counter() - started, 6)
+            self.records.append(record)
+            stage_logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+def enable_stage_logging(level=logging.INFO, stream=None):
+    """
+    計測のJSONログを1行ずつ stream（既定は標準エラー）に出す。何度呼んでもハンドラは1つだけ。
+    level には "info" のようなレベル名も渡せる。知らない名前の場合は止めずに INFO で出す。
+    """
+    unknown_level_name = None
+    if isinstance(level, str):
+        level_name = level.strip().upper()
+        level = logging.getLevelName(level_name)
+        if not isinstance(level, int): unknown_level_name, level = level_name, logging.INFO
+    stage_logger.setLevel(level)
+    if not any(getattr(handler, "syncraft_stage_handler", False) for handler in stage_logger.handlers):
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        handler.syncraft_stage_handler = True
+        stage_logger.addHandler(handler)
+        # Streamlitは再実行のたびに呼ぶので、警告はハンドラを付けた最初の1回だけ
+        if unknown_level_name is not None: stage_logger.warning("不明なログレベル %r のため INFO で出力します", unknown_level_name)
+
+
+# ===============================================================
+# ▼▼▼ XML解析関連の関数群（デコード部分を根本的に修正）▼▼▼
+# ===============================================================
+
+CONTROL_CHARS_PATTERN = re.compile(r'[\x00-\x1F\x7F-\x9F]+')
+# surrogateescape でデコードした際、UTF-8として不正なバイトはこの範囲のサロゲート文字になる
+ESCAPED_BYTE_PATTERN = re.compile('[\udc80-\udcff]')
+
+def decode_premiere_text(base64_string):
+    """
+    Premiereのソーステキスト(Base64)をデコードし、テキスト部分を抽出する（最終修正版）。
+    バイナリデータの中からUTF-8でエンコードされた文字列を直接探し出す。
+    """
+    try:
+        decoded_bytes = base64.b64decode(base64_string)
+
+        # 以前は先頭から1バイトずつずらして「そこから末尾まで」をデコードし直していたため、
+        # ペイロード長の二乗の時間がかかっていた。
+        # 末尾まで正しくデコードできる最も長い部分は「最後の不正バイトの直後から末尾まで」と一致するので、
+        # surrogateescape で一度だけデコードし、最後の不正バイトより後ろを本文とする。
+        # （不正バイトがなければ全体が本文）
+        text = decoded_bytes.decode('utf-8', errors='surrogateescape')
+        text = ESCAPED_BYTE_PATTERN.split(text)[-1]
+
+        # 不要な制御文字などを除去
+        # 制御文字の除去と前後の空白除去は、短い接尾辞ほど結果も短くなるため、最長の本文に一度だけ適用すれば十分
+        return CONTROL_CHARS_PATTERN.sub('', text).strip()
+
+    except Exception:
+        return ""
+
+
+class DecodedTextCache:
+    """
+    デコード済みテロップテキストのディスクキャッシュ（SQLite）。
+    キーはPremiereのテキストhashとBase64ペイロードのダイジェストの組で、同じシーケンスを再アップロードした時にデコードを省略できる。
+    合計サイズが max_bytes を超えたら、最後に使われた時刻が古いものから削除する（LRU）。
+    CLIでは複数のワーカープロセスが同じファイルを開くため、追加・使用時刻の更新はメモリに溜めておき、
+    commit() の短いトランザクションでまとめて書き込む（読み込み中に書き込みのロックを持ち続けない）。
+    """
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # commit() まで書き込みを待っている結果（キー → テキスト）と、使用時刻を更新するキー
+        self._pending_texts = {}
+        self._touched_keys = {}
+        # Streamlitは複数セッションのスクリプトを別スレッドで実行するため、接続はロックで共有する
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory: os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WALにしておくと、他のプロセスが書き込んでいる間も読み込みは待たされない
+        try: self._conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error: pass
+        self._conn.execute("CREATE TABLE IF NOT EXISTS decoded_text (key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, last_used INTEGER NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS decoded_text_last_used ON decoded_text (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(text_hash, base64_string):
+        payload_digest = hashlib.blake2b(base64_string.encode('utf-8'), digest_size=16).hexdigest()
+        return f"{text_hash}:{payload_digest}"
+
+    def get_or_decode(self, text_hash, base64_string):
+        """キャッシュにあればそれを返し、なければデコードして登録する。空の結果もキャッシュする。"""
+        key = self.make_key(text_hash, base64_string)
+        with self._lock:
+            if key in self._pending_texts:
+                self.hits += 1
+                return self._pending_texts[key]
+            try:
+                row = self._conn.execute("SELECT text FROM decoded_text WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._touched_keys[key] = time.time_ns()
+                    self.hits += 1
+                    return row[0]
+            except sqlite3.Error:
+                pass
+            self.misses += 1
+            decoded_text = decode_premiere_text(base64_string)
+            self._pending_texts[key] = decoded_text
+            return decoded_text
+
+    def commit(self):
+        """溜まった更新を1つのトランザクションで書き込み、上限を超えていれば古いものから削除する。"""
+        with self._lock:
+            pending_texts = self._pending_texts; touched_keys = self._touched_keys
+            self._pending_texts = {}; self._touched_keys = {}
+            try:
+                now = time.time_ns()
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO decoded_text (key, text, size, last_used) VALUES (?, ?, ?, ?)",
+                    [(key, text, len(key) + len(text.encode('utf-8')), now) for key, text in pending_texts.items()]
+                )
+                self._conn.executemany("UPDATE decoded_text SET last_used = ? WHERE key = ?", [(last_used, key) for key, last_used in touched_keys.items()])
+                total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM decoded_text").fetchone()[0]
+                if total_size > self.max_bytes:
+                    expired_keys = []
+                    for key, size in self._conn.execute("SELECT key, size FROM decoded_text ORDER BY last_used"):
+                        if total_size <= self.max_bytes: break
+                        expired_keys.append((key,)); total_size -= size
+                    self._conn.executemany("DELETE FROM decoded_text WHERE key = ?", expired_keys)
+                self._conn.commit()
+            except sqlite3.Error:
+                self._conn.rollback()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def default_decoded_text_cache_path():
+    cache_dir = os.environ.get("SYNCRAFT_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "syncraft")
+    return os.path.join(cache_dir, "decoded_text.sqlite3")
+
+
+def scan_premiere_xml(uploaded_file, text_cache=None, scan_stats=None):
+    """
+    XMLファイルをストリーミングで解析し、テロップのあるclipitemとトップレベルの <sequence> を集める。
+    要素は閉じた時点で処理して木から切り離すため、巨大なシーケンスXMLでもメモリ使用量がほぼ一定になる。
+    戻り値は (captions, sequences)。
+    captions はclipitemの出現順の (シーケンス番号, 開始フレーム, 終了フレーム, テキスト) のリストで、
+    どのシーケンスにも属さないclipitemのシーケンス番号は None。
+    sequences はトップレベルのシーケンスごとの {"name", "timebase", "ntsc", "display_format"}（いずれもXMLの文字列）のリスト。
+    clipitemの中にネストしたシーケンスは、それを含むトップレベルのシーケンスの一部として扱う。
+    scan_stats に辞書を渡すと、デコードしたテキストの数（decoded_texts）と、デコードにかかった時間
+    （decode_seconds。キャッシュの読み書きを含む）を入れて返す。残りの時間がXMLの解析にかかった時間になる。
+    """
+    if scan_stats is None: scan_stats = {}
+    scan_stats.update(decoded_texts=0, decode_seconds=0.0)
+    # 1回の走査で「hash → テキスト」の対応表と「clipitem → hash」の索引を同時に作る
+    # ハッシュはファイル全体で共有されるため、別のシーケンスのclipitemが持つテキストも参照できる
+    hash_to_text_map = {}
+    # clipitemごとの (シーケンス番号, start, end, hash) をclipitemの出現順に保持する（対象外のclipitemはNone）
+    # ハッシュに対応するテキストが後方のclipitemで初めて現れることもあるため、テキストの対応付けは最後にまとめて行う
+    clip_records = []
+    element_stack = []
+    # 開いているclipitemごとの [clip_recordsの位置, parameterid=1 のparameterを見つけたか, そのhash]
+    # ネストしたclipitemでは、内側のparameterも外側のclipitemの検索対象になる
+    open_clips = []
+    # トップレベルのシーケンス直下の <name>・<rate>・<timecode><displayformat>（ネストしたシーケンスのものは使わない）
+    sequences = []
+    current_sequence = None; current_sequence_elem = None
+
+    for event, elem in ET.iterparse(uploaded_file, events=("start", "end")):
+        if event == "start":
+            element_stack.append(elem)
+            # ルート要素自体は対象外（従来の root.findall(".//clipitem") と同じ）
+            if elem.tag == "clipitem" and len(element_stack) > 1:
+                open_clips.append([len(clip_records), False, None])
+                clip_records.append(None)
+            elif elem.tag == "sequence" and current_sequence is None and not open_clips:
+                current_sequence = {"name": None, "timebase": None, "ntsc": None, "display_format": None}
+                current_sequence_elem = elem
+                sequences.append(current_sequence)
+            continue
+
+        element_stack.pop()
+        if not element_stack:
+            continue
+        parent = element_stack[-1]
+
+        if elem.tag == "parameter":
+            param_id_node = elem.find("parameterid")
+            if param_id_node is not None and param_id_node.text == '1':
+                hash_node = elem.find("hash")
+                value_node = elem.find("value")
+
+                # 各clipitemで採用するのは、その中で最初に現れる parameterid=1 のparameterのhash
+                for open_clip in open_clips:
+                    if not open_clip[1]:
+                        open_clip[1] = True
+                        open_clip[2] = hash_node.text if hash_node is not None else None
+
+                if hash_node is not None and hash_node.text and value_node is not None and value_node.text:
+                    text_hash = hash_node.text
+                    if text_hash not in hash_to_text_map:
+                        decode_started = time.perf_counter()
+                        if text_cache is not None: decoded_text = text_cache.get_or_decode(text_hash, value_node.text)
+                        else: decoded_text = decode_premiere_text(value_node.text)
+                        scan_stats["decode_seconds"] += time.perf_counter() - decode_started; scan_stats["decoded_texts"] += 1
+                        if decoded_text:
+                            hash_to_text_map[text_hash] = decoded_text
+
+        elif elem.tag == "clipitem":
+            record_index, _, text_hash = open_clips.pop()
+            start_node = elem.find("start")
+            end_node = elem.find("end")
+
+            if start_node is not None and end_node is not None and text_hash:
+                clip_records[record_index] = (len(sequences) - 1 if current_sequence is not None else None, start_node.text, end_node.text, text_hash)
+
+        elif elem.tag == "sequence":
+            if elem is current_sequence_elem: current_sequence = None; current_sequence_elem = None
+
+        elif elem.tag == "name":
+            if parent is current_sequence_elem and current_sequence["name"] is None:
+                current_sequence["name"] = elem.text
+
+        elif elem.tag == "rate":
+            if parent is current_sequence_elem and current_sequence["timebase"] is None:
+                current_sequence["timebase"] = elem.findtext("timebase"); current_sequence["ntsc"] = elem.findtext("ntsc")
+
+        elif elem.tag == "displayformat":
+            if parent.tag == "timecode" and element_stack[-2] is current_sequence_elem and current_sequence["display_format"] is None:
+                current_sequence["display_format"] = elem.text
+
+        # 処理済みの要素は木から切り離す
+        # まだ閉じていないparameter/clipitemが後で参照する直下の子要素だけは残す
+        if parent.tag == "parameter":
+            if elem.tag in ("parameterid", "hash", "value"):
+                continue
+        elif parent.tag == "clipitem":
+            if elem.tag in ("start", "end"):
+                continue
+        elif parent.tag == "rate":
+            if elem.tag in ("timebase", "ntsc"):
+                continue
+        # iterparseはチャンク単位で先読みするため、親の末尾が常にこの要素とは限らない
+        # 処理済みの兄弟はすでに切り離されているので、removeでもほぼ先頭で見つかる
+        parent.remove(elem)
+
+    if text_cache is not None:
+        commit_started = time.perf_counter()
+        text_cache.commit()
+        scan_stats["decode_seconds"] += time.perf_counter() - commit_started
+
+    captions = []
+    for record in clip_records:
+        if record is None:
+            continue
+        sequence_index, start_text, end_text, text_hash = record
+        narration_text = hash_to_text_map.get(text_hash)
+
+        if narration_text:
+            captions.append((sequence_index, int(start_text), int(end_text), narration_text))
+
+    return captions, sequences
+
+def sequence_timecode_rate(timebase_text, ntsc_text, display_format_text=None):
+    """シーケンスの <rate> からタイムコードのレートを作る（読み取れなければ29.97fpsドロップフレーム）。"""
+    if timebase_text and timebase_text.strip().isdigit(): return TimecodeRate.from_xml(timebase_text, ntsc_text, display_format_text)
+    return NTSC_30_DF
+
+def format_caption_text(captions, rate):
+    """(…, 開始フレーム, 終了フレーム, テキスト) の列を「開始 - 終了\\nテキスト」のブロックを空行でつないだテキストにする。"""
+    # 開始・終了のフレーム数をまとめてタイムコードにする
+    frame_counts = []
+    for caption in captions: frame_counts.append(caption[1]); frame_counts.append(caption[2])
+    timecodes = frames_to_timecodes(frame_counts, rate)
+    output_blocks = [f"{timecodes[2 * i]} - {timecodes[2 * i + 1]}\n{caption[3]}" for i, caption in enumerate(captions)]
+
+    if not output_blocks:
+        return "エラー：XML内に解析可能なテロップデータが見つかりませんでした。ファイル形式が異なる可能性があります。"
+
+    return "\n\n".join(output_blocks)
+
+def parse_premiere_xml(uploaded_file, text_cache=None, sequence_info=None):
+    """
+    XMLファイルをストリーミングで解析し、ファイル内のすべてのテロップ情報を1つのテキストにする。
+    タイムコードは最初のシーケンスの <rate> のフレームレートで計算する（見つからなければ29.97fpsドロップフレーム）。
+    text_cache（DecodedTextCache）を渡すと、前回までにデコードしたテキストを再利用する。
+    sequence_info に辞書を渡すと、使ったフレームレート（TimecodeRate）を "rate" に入れて返す。
+    シーケンスごとに分けたい場合は parse_premiere_xml_sequences を使う。
+    """
+    try:
+        captions, sequences = scan_premiere_xml(uploaded_file, text_cache)
+
+        # <rate> を持つ最初のシーケンスのレートと表示形式を使う（別のシーケンスの DF/NDF を混ぜない）
+        timebase_sequence = next((sequence for sequence in sequences if sequence["timebase"] is not None), None)
+        if timebase_sequence is not None: rate = sequence_timecode_rate(timebase_sequence["timebase"], timebase_sequence["ntsc"], timebase_sequence["display_format"])
+        else: rate = NTSC_30_DF
+        if sequence_info is not None: sequence_info["rate"] = rate
+
+        return format_caption_text(captions, rate)
+
+    except ET.ParseError:
+        return "エラー：XMLファイルの解析に失敗しました。ファイルが破損しているか、形式が正しくありません。"
+    except Exception as e:
+        return f"予期せぬエラーが発生しました: {e}"
+
+def parse_premiere_xml_sequences(uploaded_file, text_cache=None, scan_stats=None):
+    """
+    XMLファイルをストリーミングで解析し、トップレベルの <sequence> ごとにテロップ情報を抽出する。
+    戻り値はテロップのあるシーケンスごとの {"name", "rate", "caption_text"} のリスト（XML内の順）。
+    タイムコードは各シーケンス自身の <rate> で計算する。
+    シーケンスに属さないclipitemのテロップは「シーケンス外」としてまとめる。
+    scan_stats は scan_premiere_xml と同じ（デコードの件数と時間）。
+    ファイル全体の解析に失敗した場合やテロップが1件もない場合は、caption_text にエラー文を入れた1件だけを返す。
+    """
+    try:
+        captions, sequences = scan_premiere_xml(uploaded_file, text_cache, scan_stats)
+    except ET.ParseError:
+        return [{"name": "", "rate": NTSC_30_DF, "caption_text": "エラー：XMLファイルの解析に失敗しました。ファイルが破損しているか、形式が正しくありません。"}]
+    except Exception as e:
+        return [{"name": "", "rate": NTSC_30_DF, "caption_text": f"予期せぬエラーが発生しました: {e}"}]
+
+    # シーケンス番号ごとにテロップを振り分ける（シーケンス外は末尾にまとめる）
+    sequence_captions = {}
+    for caption in captions: sequence_captions.setdefault(caption[0], []).append(caption)
+
+    results = []
+    for sequence_index, sequence in enumerate(sequences):
+        if sequence_index not in sequence_captions: continue
+        rate = sequence_timecode_rate(sequence["timebase"], sequence["ntsc"], sequence["display_format"])
+        name = (sequence["name"] or "").strip() or f"シーケンス{sequence_index + 1}"
+        results.append({"name": name, "rate": rate, "caption_text": format_caption_text(sequence_captions[sequence_index], rate)})
+    if None in sequence_captions:
+        # どのシーケンスのレートも当てはまらないため、ファイル全体と同じく最初のシーケンスのレートを使う
+        timebase_sequence = next((sequence for sequence in sequences if sequence["timebase"] is not None), None)
+        rate = sequence_timecode_rate(timebase_sequence["timebase"], timebase_sequence["ntsc"], timebase_sequence["display_format"]) if timebase_sequence is not None else NTSC_30_DF
+        results.append({"name": "シーケンス外", "rate": rate, "caption_text": format_caption_text(sequence_captions[None], rate)})
+
+    if not results:
+        return [{"name": "", "rate": NTSC_30_DF, "caption_text": format_caption_text([], NTSC_30_DF)}]
+    return results
+
+# ===============================================================
+# ▼▼▼ タイムコード関連 ▼▼▼
+# ===============================================================
+
+# 00〜99 の2桁表記を前もって作っておき、大量のタイムコードを組み立てる時の書式化を省く
+TWO_DIGITS = [f"{i:02d}" for i in range(100)]
+
+class TimecodeRate:
+    """
+    タイムコードのフレームレート。timebase は1秒あたりの公称フレーム数（29.97なら30）。
+    ドロップフレームの場合、10分ごとの区切りを除く毎分の先頭で timebase / 15 フレーム分の番号を飛ばす。
+    その計算に使う1分・10分あたりの実フレーム数は、生成時に一度だけ求めておく。
+    """
+    __slots__ = ('timebase', 'ntsc', 'drop_frame', 'dropped_per_minute', 'frames_per_minute', 'frames_per_10_minutes')
+
+    def __init__(self, timebase, ntsc=False, drop_frame=False):
+        self.timebase = timebase; self.ntsc = ntsc; self.drop_frame = drop_frame
+        self.dropped_per_minute = timebase // 15 if drop_frame else 0
+        self.frames_per_minute = timebase * 60 - self.dropped_per_minute
+        self.frames_per_10_minutes = timebase * 600 - 9 * self.dropped_per_minute
+
+    @property
+    def label(self):
+        if not self.ntsc: return str(self.timebase)
+        fps = f"{self.timebase * 1000 / 1001:.3f}".rstrip('0').rstrip('.')
+        if self.timebase in (30, 60): return fps + ("DF" if self.drop_frame else "NDF")
+        return fps
+
+    @classmethod
+    def from_xml(cls, timebase_text, ntsc_text, display_format_text=None):
+        """
+        XMLの <rate> の <timebase>・<ntsc> と、<timecode> の <displayformat>（DF/NDF）から作る。
+        displayformat がなければ、29.97・59.94 はドロップフレームとみなす。
+        ドロップフレームのタイムコードは 29.97・59.94 にしかないので、それ以外では DF の指定があってもノンドロップにする。
+        """
+        timebase = int(timebase_text)
+        ntsc = (ntsc_text or '').strip().upper() == 'TRUE'
+        drop_frame = ntsc and timebase in (30, 60)
+        if display_format_text: drop_frame = drop_frame and display_format_text.strip().upper() == 'DF'
+        return cls(timebase, ntsc, drop_frame)
+
+    @classmethod
+    def from_fps(cls, frame_rate):
+        """29.97 / 59.94 はドロップフレーム、23.976 はノンドロップとして扱う。"""
+        timebase = round(frame_rate)
+        ntsc = abs(frame_rate - timebase) > 0.001
+        return cls(timebase, ntsc, ntsc and timebase in (30, 60))
+
+# Premiereの既定（29.97fps ドロップフレーム）
+NTSC_30_DF = TimecodeRate(30, ntsc=True, drop_frame=True)
+TIMECODE_RATES = {rate.label: rate for rate in (
+    TimecodeRate(24, ntsc=True), TimecodeRate(24), TimecodeRate(25), NTSC_30_DF,
+    TimecodeRate(30), TimecodeRate(60, ntsc=True, drop_frame=True),
+)}
+
+def frames_to_timecode(total_frames, rate=NTSC_30_DF):
+    """
+    フレーム数を hh;mm;ss;ff 形式のタイムコードにする。
+    区切りはレートによらず「;」（convert_narration_script がそのまま読める形式）。
+    """
+    if total_frames < 0: return "00;00;00;00"
+    timebase = rate.timebase
+    if rate.drop_frame:
+        drop = rate.dropped_per_minute
+        num_10_minute_chunks, remaining_frames = divmod(total_frames, rate.frames_per_10_minutes)
+        # 10分ごとの最初の1分だけは番号を飛ばさないため、その分をずらしてから1分単位で数える
+        num_minute_chunks = (remaining_frames - drop) // rate.frames_per_minute if remaining_frames >= drop else 0
+        total_frames += (9 * drop * num_10_minute_chunks) + (drop * num_minute_chunks)
+    total_seconds, ff = divmod(total_frames, timebase)
+    total_minutes, ss = divmod(total_seconds, 60)
+    hh, mm = divmod(total_minutes, 60)
+    return f"{hh:02d};{mm:02d};{ss:02d};{ff:02d}"
+
+def frames_to_timecodes(frame_counts, rate=NTSC_30_DF):
+    """
+    フレーム数の列をまとめてタイムコードのリストにする（結果は frames_to_timecode と同じ）。
+    NumPyがあれば配列演算で一度に計算し、なければ1件ずつ計算する。
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return [frames_to_timecode(total_frames, rate) for total_frames in frame_counts]
+    frames = np.asarray(frame_counts, dtype=np.int64)
+    if frames.size == 0: return []
+    # 負のフレーム数は frames_to_timecode と同じく 00;00;00;00 にする
+    frames = np.maximum(frames, 0)
+    if rate.drop_frame:
+        drop = rate.dropped_per_minute
+        num_10_minute_chunks, remaining_frames = np.divmod(frames, rate.frames_per_10_minutes)
+        num_minute_chunks = np.where(remaining_frames >= drop, (remaining_frames - drop) // rate.frames_per_minute, 0)
+        frames = frames + (9 * drop * num_10_minute_chunks) + (drop * num_minute_chunks)
+    total_seconds, ff = np.divmod(frames, rate.timebase)
+    total_minutes, ss = np.divmod(total_seconds, 60)
+    hh, mm = np.divmod(total_minutes, 60)
+    return [
+        f"{TWO_DIGITS[h] if h < 100 else h};{TWO_DIGITS[m]};{TWO_DIGITS[s]};{TWO_DIGITS[f]}"
+        for h, m, s, f in zip(hh.tolist(), mm.tolist(), ss.tolist(), ff.tolist())
+    ]
+
+def frames_to_df_timecode(total_frames, frame_rate=29.97):
+    return frames_to_timecode(total_frames, TimecodeRate.from_fps(frame_rate))
+
+# ===============================================================
+# ▼▼▼ Gemini 誤字脱字チェック関連 ▼▼▼
+# ===============================================================
+
+GEMINI_MODEL = 'gemini-1.5-flash'
+# 原稿はブロック単位でチャンクに分け、並列にチェックする
+GEMINI_CHUNK_BLOCKS = 40
+GEMINI_MAX_WORKERS = 4
+# レート制限(429)や一時的なサーバーエラーは指数バックオフで再試行する
+GEMINI_MAX_RETRIES = 4
+GEMINI_RETRY_BASE_SECONDS = 2.0
+GEMINI_RETRYABLE_CODES = {429, 500, 503}
+
+def build_proofreading_prompt(formatted_text):
+    return f"""
+        あなたはプロの校正者です。以下のナレーション原稿の誤字脱字をチェックし、修正案を提示してください。
+        # 制約条件
+        - ナレーション特有の句読点やスペースは修正しない。
+        - 芸能人の名前は正しく校正する。
+        - 文末が不自然でも、意図的なものとして修正しない。
+        - 漢数字は使用せず、算用数字のままにする。
+        - 誤りがない場合は「問題ありませんでした。」とだけ出力する。
+        # 出力形式
+        - 誤りがある場合のみ、以下のMarkdownテーブル形式で出力する。
+        - 「No.」列には必ず元の番号を入れる。
+        - 「修正提案」列で誤字脱字を指摘する時は「○○ → △△」のようにどう間違ってるか明確に記載。
+        - 「理由」列は「〇〇の誤り」、「〇〇では？」のように簡潔に記載する。
+        【出力形式】
+        | No. | 修正提案 | 理由 |
+        |---|---|---|
+        | (番号) | (正しい単語・フレーズ) | (修正理由) |
+        【ナレーション原稿】
+        ---
+        {formatted_text}
+        ---
+        """
+
+def parse_gemini_table_rows(ai_result_md):
+    """
+    Geminiが返したMarkdownテーブルから (No., 修正提案, 理由) の行を取り出す。
+    """
+    rows = []
+    for line in ai_result_md.splitlines():
+        if line.strip().startswith('|') and '---' not in line and 'No.' not in line:
+            try:
+                parts = [p.strip() for p in line.strip().strip('|').split('|')]
+                num_str, suggestion, reason = parts[0], parts[1], parts[2]
+                rows.append((int(re.search(r'\d+', num_str).group()), suggestion, reason))
+            except (ValueError, IndexError, AttributeError): continue
+    return rows
+
+def block_text_digest(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+def generate_with_retry(client, prompt):
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        try:
+            response = client.models.generate_content(model=GEMINI_MODEL, contents=prompt)
+            return getattr(response, "text", "") or ""
+        except Exception as e:
+            if getattr(e, "code", None) not in GEMINI_RETRYABLE_CODES or attempt == GEMINI_MAX_RETRIES: raise
+            # 並列のリクエストが同時に再試行しないよう、待ち時間にゆらぎを入れる
+            time.sleep(GEMINI_RETRY_BASE_SECONDS * (2 ** attempt) * (1 + random.random()))
+
+def format_gemini_error(e):
+    # google-genai をまだ読み込んでいなければ、その例外が APIError であることはない
+    gemini_errors = sys.modules.get("google.genai.errors")
+    # 結果のMarkdownではテーブル以外の行をエラーとして扱うので、1件を1行にまとめる
+    detail = " ".join(str(e).split())
+    if gemini_errors is not None and isinstance(e, gemini_errors.APIError): return f"Gemini APIエラーが発生しました。詳細: {detail}"
+    return f"予期せぬエラー: {detail}"
+
+def format_gemini_check_result(digests, result_cache, errors):
+    table_rows = [f"| {i+1} | {suggestion} | {reason} |" for i, digest in enumerate(digests) for suggestion, reason in result_cache.get(digest, [])]
+    # 失敗したチャンクがあれば、指摘がなくても「問題なし」とはしない
+    if not table_rows: return "\n".join(errors) if errors else "問題ありませんでした。"
+    result_md = "| No. | 修正提案 | 理由 |\n|---|---|---|\n" + "\n".join(table_rows)
+    if errors: result_md += "\n\n" + "\n".join(errors)
+    return result_md
+
+def iter_narration_check_results(narration_blocks, api_key, result_cache=None, client=None, check_stats=None):
+    """
+    ナレーション原稿をチャンクに分けてGeminiで並列に校正し、チャンクが終わるたびに
+    (その時点までの結果をまとめたMarkdownテーブル, 完了したチャンク数, 全チャンク数) を返すジェネレータ。
+    No.は原稿全体での通し番号のまま送る。
+    result_cache（本文のダイジェスト → 指摘のリスト）を渡すと、チェック済みのブロックは送らずに結果を再利用する。
+    キャッシュ済みのブロックの結果は、最初の1回でまとめて返す。
+    client を渡すとそれを使う（テスト用の偽クライアントなど）。
+    check_stats に辞書を渡すと、ブロック数・キャッシュで済んだブロック数・送ったブロック数・チャンク数・
+    失敗したチャンク数と、プロンプト・応答の合計文字数を入れて返す。
+    """
+    if check_stats is None: check_stats = {}
+    check_stats.update(blocks=len(narration_blocks), cached_blocks=0, sent_blocks=0, chunks=0, failed_chunks=0, prompt_chars=0, response_chars=0)
+    if not api_key and client is None: yield "エラー：Gemini APIキーが設定されていません。", 0, 0; return
+    if result_cache is None: result_cache = {}
+    try:
+        if client is None:
+            from google import genai
+            client = genai.Client(api_key=api_key)
+        digests = [block_text_digest(b['text']) for b in narration_blocks]
+        # 未チェックのブロックだけを送る（同じ本文のブロックは最初の1つだけ）
+        pending_indices = []; pending_digests = set()
+        for i, digest in enumerate(digests):
+            if digest not in result_cache and digest not in pending_digests:
+                pending_indices.append(i); pending_digests.add(digest)
+        chunks = [pending_indices[k:k + GEMINI_CHUNK_BLOCKS] for k in range(0, len(pending_indices), GEMINI_CHUNK_BLOCKS)]
+        check_stats.update(cached_blocks=sum(1 for digest in digests if digest in result_cache), sent_blocks=len(pending_indices), chunks=len(chunks))
+
+        def check_chunk(chunk):
+            formatted_text = "\n".join([f"No.{i+1}: {narration_blocks[i]['text']}" for i in chunk])
+            prompt = build_proofreading_prompt(formatted_text)
+            response_text = generate_with_retry(client, prompt)
+            return parse_gemini_table_rows(response_text), len(prompt), len(response_text)
+
+        errors = []
+        yield format_gemini_check_result(digests, result_cache, errors), 0, len(chunks)
+        if not chunks: return
+        with ThreadPoolExecutor(max_workers=GEMINI_MAX_WORKERS) as executor:
+            future_to_chunk = {executor.submit(check_chunk, chunk): chunk for chunk in chunks}
+            for completed_chunks, future in enumerate(as_completed(future_to_chunk), start=1):
+                chunk = future_to_chunk[future]
+                try:
+                    rows, prompt_chars, response_chars = future.result()
+                    check_stats["prompt_chars"] += prompt_chars; check_stats["response_chars"] += response_chars
+                    # 失敗したチャンクはキャッシュしないので、次回のチェックで再送される
+                    chunk_findings = {i: [] for i in chunk}
+                    for no, suggestion, reason in rows:
+                        if no - 1 in chunk_findings: chunk_findings[no - 1].append((suggestion, reason))
+                    for i, findings in chunk_findings.items(): result_cache[digests[i]] = findings
+                except Exception as e:
+                    errors.append(f"No.{chunk[0]+1}〜{chunk[-1]+1} のチェックに失敗しました。{format_gemini_error(e)}"); check_stats["failed_chunks"] += 1
+                yield format_gemini_check_result(digests, result_cache, errors), completed_chunks, len(chunks)
+    except Exception as e: yield format_gemini_error(e), 0, 0
+
+def check_narration_with_gemini(narration_blocks, api_key, result_cache=None, client=None, check_stats=None):
+    """
+    iter_narration_check_results をすべてのチャンクが終わるまで進め、最終的なMarkdownテーブルを返す。
+    """
+    ai_result_md = ""
+    for ai_result_md, _, _ in iter_narration_check_results(narration_blocks, api_key, result_cache, client, check_stats): pass
+    return ai_result_md
+
+def build_ai_check_display(ai_result_md, block_start_times):
+    """
+    Geminiの結果のNo.を開始タイムに置き換えた表示用テーブルと、🔴を付けるブロック番号の集合、
+    エラーの行のリストを返す。エラーはテーブルとは別に表示するためのもの。
+    """
+    highlight_indices = set()
+    if not ai_result_md: return highlight_indices, ai_result_md, []
+    # format_gemini_check_result の結果では、テーブルと「問題ありませんでした。」以外の行はすべてエラー
+    errors = [line.strip() for line in ai_result_md.splitlines() if line.strip() and not line.strip().startswith('|') and line.strip() != "問題ありませんでした。"]
+    if not errors and "問題ありませんでした" in ai_result_md: return highlight_indices, ai_result_md, errors
+    new_table_header = "| タイム | 修正提案 | 理由 |\n|---|---|---|"
+    new_table_rows = []
+    for no, suggestion, reason in parse_gemini_table_rows(ai_result_md):
+        index = no - 1
+        if 0 <= index < len(block_start_times):
+            highlight_indices.add(index)
+            start_time = block_start_times[index]
+            new_table_rows.append(f"| {start_time} | {suggestion} | {reason} |")
+    if new_table_rows: return highlight_indices, new_table_header + "\n" + "\n".join(new_table_rows), errors
+    # チェックできなかったブロックがある時は「指摘なし」とは表示しない
+    if errors: return highlight_indices, "", errors
+    return highlight_indices, "AIによる指摘事項はありませんでした。", errors
+
+# ===============================================================
+# ▼▼▼ 原稿変換関連 ▼▼▼
+# ===============================================================
+
+TO_ZENKAKU_NUM = str.maketrans('0123456789', '０１２３４５６７８９')
+HANKAKU_SYMBOLS = '!@#$%&-+='; ZENKAKU_SYMBOLS = '！＠＃＄％＆－＋＝'
+HANKAKU_CHARS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 ' + HANKAKU_SYMBOLS
+ZENKAKU_CHARS = 'ａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｖｗｘｙｚＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺ０１２３４５６７８９　' + ZENKAKU_SYMBOLS
+TO_ZENKAKU_ALL = str.maketrans(HANKAKU_CHARS, ZENKAKU_CHARS)
+TO_HANKAKU_TIME = str.maketrans('０１２３４５６７８９：〜', '0123456789:~')
+
+
+class NarrationBlock:
+    """
+    解析済みのテロップ1ブロック（タイムコード行と本文）。
+    チェックボックスの切り替えでは再解析せず、このブロック列から描画し直す。
+    """
+    __slots__ = ('time', 'text', 'start_hh', 'start_mm', 'start_ss', 'start_fr', 'end_hh', 'end_mm', 'end_ss', 'end_fr')
+
+    def __init__(self, time, text, start_hh, start_mm, start_ss, start_fr, end_hh, end_mm, end_ss, end_fr):
+        self.time = time; self.text = text
+        self.start_hh = start_hh; self.start_mm = start_mm; self.start_ss = start_ss; self.start_fr = start_fr
+        self.end_hh = end_hh; self.end_mm = end_mm; self.end_ss = end_ss; self.end_fr = end_fr
+
+
+TIMECODE_LINE_PATTERN = re.compile(r'(\d{2})[:;](\d{2})[:;](\d{2})[;.](\d{2})\s*-\s*(\d{2})[:;](\d{2})[:;](\d{2})[;.](\d{2})')
+FRAMELESS_TIME_PATTERN = re.compile(r'(\d{2}:\d{2}:\d{2})(?![:.]\d{2})')
+# 空白だけの行も空行として扱う（str.strip() と同じく \s は全角スペースも含む）
+BLANK_LINES_PATTERN = re.compile(r'\n\s*\n')
+
+def lex_timecode_line(stripped_line):
+    """
+    前後の空白を除いた1行を判定し、タイムコード行なら (開始hh, mm, ss, fr, 終了hh, mm, ss, fr) を、本文行なら None を返す。
+    フレームのない hh:mm:ss は .00 を補い、全角数字・全角コロン・〜 は半角に揃えてから判定する。
+    """
+    # 正規化しても先頭2文字が数字かどうかは変わらないので、本文行の大半はここで判定が終わる
+    if len(stripped_line) < 2 or not stripped_line[:2].isdecimal(): return None
+    # フレーム補完は半角コロン区切り、全角→半角変換は非ASCII文字を含む行でしか効かないため、必要な行にだけ適用する
+    normalized_line = FRAMELESS_TIME_PATTERN.sub(r'\1.00', stripped_line) if ':' in stripped_line else stripped_line
+    if not normalized_line.isascii(): normalized_line = normalized_line.translate(TO_HANKAKU_TIME)
+    normalized_line = normalized_line.replace('~', '-')
+    time_match = TIMECODE_LINE_PATTERN.match(normalized_line)
+    if not time_match: return None
+    return tuple(map(int, time_match.groups()))
+
+
+def parse_narration_script(text):
+    """
+    元原稿をタイムコードと本文のブロック列に分解する。
+    変換可能なタイムコードが見つからない場合は None を返す。
+    """
+    return parse_narration_lines(text.strip().split('\n')) or None
+
+
+def parse_narration_lines(lines):
+    """
+    行のリストをブロック列に分解する。見つからなければ空のリストを返す。
+    各行は lex_timecode_line で一度だけ判定し、最初のタイムコード行より前の行と、ブロックに属さない本文行は読み飛ばす。
+    """
+    pending_blocks = []; text_lines = None
+    for line in lines:
+        stripped_line = line.strip()
+        # 空行でブロックが終わる
+        if not stripped_line: text_lines = None; continue
+        time_fields = lex_timecode_line(stripped_line)
+        if time_fields is not None:
+            text_lines = []; pending_blocks.append((stripped_line, text_lines, time_fields))
+        elif text_lines is not None:
+            text_lines.append(line)
+    return [NarrationBlock(time_val, "\n".join(text_lines), *time_fields) for time_val, text_lines, time_fields in pending_blocks]
+
+
+# 貼り付けたテキストからはフレームレートがわからないため、フレーム番号は30fps（29.97含む）として読む
+DEFAULT_TIMEBASE = 30
+# 次のブロックまでの間隔がこれ（秒）未満なら、ENDタイムと空行を入れずにつなげる
+CONNECTION_THRESHOLD = 1.0 + (10.0 / DEFAULT_TIMEBASE)
+
+def narration_h_marker_hour(block, previous_block):
+    """ブロックの前に【ＮＨ】の仕切りを入れる場合はその時（hh）を、入れない場合は None を返す。"""
+    if previous_block is None: return block.start_hh if block.start_hh > 0 else None
+    if block.start_hh < block.end_hh: return block.end_hh
+    if block.start_hh > previous_block.end_hh: return block.start_hh
+    return None
+
+def render_narration_block(block, previous_block, next_block, n_force_insert_flag=True, mm_ss_colon_flag=False, highlighted=False, timebase=DEFAULT_TIMEBASE):
+    """
+    1ブロック分の出力行と開始タイムを返す。
+    Ｈの仕切りは直前のブロックのENDの時、ENDタイムと空行は次のブロックの開始タイムで決まるため、前後のブロックも受け取る。
+    秒・半秒の判定は、30fpsでのフレーム番号の区切り（0〜9 / 10〜22 / 23〜）を timebase に合わせて換算して行う。
+    """
+    start_hh, start_mm, start_ss, start_fr = block.start_hh, block.start_mm, block.start_ss, block.start_fr
+    end_hh, end_mm, end_ss, end_fr = block.end_hh, block.end_mm, block.end_ss, block.end_fr
+    output_lines = []
+    marker_hh_to_display = narration_h_marker_hour(block, previous_block)
+    if marker_hh_to_display is not None: output_lines.append(""); output_lines.append(f"【{str(marker_hh_to_display).translate(TO_ZENKAKU_NUM)}Ｈ】")
+    total_seconds_in_minute_loop = (start_mm % 60) * 60 + start_ss
+    spacer = ""; is_half_time = False; base_time_str = ""
+    if start_fr * 30 < 10 * timebase:
+        display_mm = (total_seconds_in_minute_loop // 60) % 60; display_ss = total_seconds_in_minute_loop % 60
+        base_time_str = f"{display_mm:02d}{display_ss:02d}"; spacer = "　　　"
+    elif start_fr * 30 < 23 * timebase:
+        display_mm = (total_seconds_in_minute_loop // 60) % 60; display_ss = total_seconds_in_minute_loop % 60
+        base_time_str = f"{display_mm:02d}{display_ss:02d}"; spacer = "　　"; is_half_time = True
+    else:
+        total_seconds_in_minute_loop += 1
+        display_mm = (total_seconds_in_minute_loop // 60) % 60; display_ss = total_seconds_in_minute_loop % 60
+        base_time_str = f"{display_mm:02d}{display_ss:02d}"; spacer = "　　　"
+    colon_time_str = f"{base_time_str[:2]}：{base_time_str[2:]}" if mm_ss_colon_flag else base_time_str
+    formatted_start_time = f"{colon_time_str.translate(TO_ZENKAKU_NUM)}半" if is_half_time else colon_time_str.translate(TO_ZENKAKU_NUM)
+    text_content = block.text.strip(' \u3000'); speaker_symbol = ''; body = ''
+    if n_force_insert_flag:
+        speaker_symbol = 'Ｎ'
+        n_match = re.match(r'^[\s　]*[NnＮｎ](?:[\s　]*[：:])?(?![A-Za-z0-9])[\s　]*(.*)$', text_content, re.DOTALL)
+        if n_match: body = n_match.group(1)
+        else: body = text_content
+    else: speaker_symbol = ''; body = text_content
+    body = body.strip(' \u3000')
+    if not body: body = "※注意！本文なし！"
+    body = body.translate(TO_ZENKAKU_ALL)
+    end_string = ""; add_blank_line = True
+    if next_block is not None:
+        end_total_seconds = (end_hh * 3600) + (end_mm * 60) + end_ss + (end_fr / timebase)
+        next_start_total_seconds = (next_block.start_hh * 3600) + (next_block.start_mm * 60) + next_block.start_ss + (next_block.start_fr / timebase)
+        if next_start_total_seconds - end_total_seconds < CONNECTION_THRESHOLD: add_blank_line = False
+    if add_blank_line:
+        adj_ss = end_ss; adj_mm = end_mm
+        if end_fr * 30 < 10 * timebase: adj_ss = end_ss - 1
+        if adj_ss < 0: adj_ss = 59; adj_mm -= 1
+        adj_mm_display = adj_mm % 60
+        if start_hh != end_hh or (start_mm % 60) != adj_mm_display: formatted_end_time = f"{adj_mm_display:02d}{adj_ss:02d}".translate(TO_ZENKAKU_NUM)
+        else: formatted_end_time = f"{adj_ss:02d}".translate(TO_ZENKAKU_NUM)
+        end_string = f" ／{formatted_end_time}"
+    line_prefix = "🔴" if highlighted else ""
+    body_lines = body.split('\n')
+    first_line_prefix_parts = [formatted_start_time, spacer]
+    if speaker_symbol: first_line_prefix_parts.append(f"{speaker_symbol}　")
+    first_line_prefix = "".join(first_line_prefix_parts)
+    indent_space = '　' * len(first_line_prefix)
+    first_line_text = body_lines[0].lstrip(' \u3000')
+    end_string_for_first_line = end_string if len(body_lines) == 1 else ""
+    output_lines.append(f"{line_prefix}{first_line_prefix}{first_line_text}{end_string_for_first_line}")
+    if len(body_lines) > 1:
+        for k, line_text in enumerate(body_lines[1:]):
+            end_string_for_this_line = end_string if k == len(body_lines) - 2 else ""
+            output_lines.append(indent_space + line_text.lstrip(' \u3000') + end_string_for_this_line)
+    if add_blank_line and next_block is not None: output_lines.append("")
+    return output_lines, formatted_start_time
+
+
+def render_narration_script(parsed_blocks, n_force_insert_flag=True, mm_ss_colon_flag=False, highlight_indices=None, timebase=DEFAULT_TIMEBASE):
+    """
+    parse_narration_script の結果からナレーション原稿を組み立てる。
+    """
+    if parsed_blocks is None: return {"narration_script": "エラー：変換可能なタイムコードが見つかりませんでした。", "ai_data": [], "start_times": []}
+    if highlight_indices is None: highlight_indices = set()
+    output_lines = []; block_start_times = []
+    narration_blocks_for_ai = narration_ai_data(parsed_blocks)
+    for i, block in enumerate(parsed_blocks):
+        previous_block = parsed_blocks[i-1] if i > 0 else None
+        next_block = parsed_blocks[i+1] if i + 1 < len(parsed_blocks) else None
+        block_lines, formatted_start_time = render_narration_block(block, previous_block, next_block, n_force_insert_flag, mm_ss_colon_flag, i in highlight_indices, timebase)
+        output_lines.extend(block_lines); block_start_times.append(formatted_start_time)
+    return {"narration_script": "\n".join(output_lines), "ai_data": narration_blocks_for_ai, "start_times": block_start_times}
+
+def narration_ai_data(parsed_blocks):
+    """Geminiのチェックに送る {'time', 'text'} のリスト。"""
+    return [{'time': block.time.strip(), 'text': block.text.strip()} for block in parsed_blocks]
+
+def narration_page_ranges(parsed_blocks):
+    """
+    長い原稿を時（hh）ごとのページに分ける。【ＮＨ】の仕切りが入るブロックから次のページにし、
+    (見出し, 開始ブロック番号, 終了ブロック番号) のリストを返す（終了は含まない）。
+    """
+    pages = []
+    for i, block in enumerate(parsed_blocks):
+        marker_hh = narration_h_marker_hour(block, parsed_blocks[i-1] if i > 0 else None)
+        if marker_hh is None and i > 0: continue
+        if pages: pages[-1][2] = i
+        pages.append([f"【{str(marker_hh if marker_hh is not None else block.start_hh).translate(TO_ZENKAKU_NUM)}Ｈ】", i, len(parsed_blocks)])
+    return [tuple(page) for page in pages]
+
+def join_fragment_lines(fragments, start=0, end=None):
+    """ブロックごとの (出力行のリスト, 開始タイム) のうち start〜end のブロック分を、原稿のテキストにする。"""
+    return "\n".join(line for block_lines, _ in fragments[start:end] for line in block_lines)
+
+def iter_narration_script_chunks(fragments, blocks_per_chunk=200):
+    """
+    join_fragment_lines(fragments) と同じ原稿を、blocks_per_chunk ブロックずつ少しずつ返すジェネレータ。
+    原稿全体を1つの文字列にせずに書き出す時に使う。
+    """
+    for start in range(0, len(fragments), blocks_per_chunk):
+        chunk = join_fragment_lines(fragments, start, start + blocks_per_chunk)
+        yield chunk if start == 0 else "\n" + chunk
+
+def convert_narration_script(text, n_force_insert_flag=True, mm_ss_colon_flag=False, highlight_indices=None, timebase=DEFAULT_TIMEBASE):
+    return render_narration_script(parse_narration_script(text), n_force_insert_flag, mm_ss_colon_flag, highlight_indices, timebase)
+
+
+class IncrementalNarrationConverter:
+    """
+    テキストエリアを編集するたびに全体を変換し直さないための変換器。
+    入力を空行で段落に区切り、前回から変わった段落だけを解析し直す。
+    描画も「ブロック・前後のブロックの状態・オプション」が前回と同じものは使い回し、
+    変わったブロックと、その前後でＨの仕切りやENDタイム・空行の判定が変わりうるブロックだけを描画し直す。
+    """
+    def __init__(self):
+        self._last_text = None
+        self._last_blocks = None
+        self._segment_cache = {}
+        self._fragment_cache = {}
+
+    def parse(self, text):
+        """parse_narration_script と同じ結果を返す。変更のない段落は前回のブロックをそのまま使う。"""
+        if text == self._last_text: return self._last_blocks
+        # parse_narration_script は空行でブロックを区切り直すため、段落ごとに解析して連結しても結果は同じになる
+        segment_cache = {}; parsed_blocks = []
+        for segment in BLANK_LINES_PATTERN.split(text.strip()):
+            segment_blocks = self._segment_cache.get(segment)
+            if segment_blocks is None: segment_blocks = parse_narration_lines(segment.split('\n'))
+            segment_cache[segment] = segment_blocks
+            parsed_blocks.extend(segment_blocks)
+        self._segment_cache = segment_cache
+        self._last_text = text
+        self._last_blocks = parsed_blocks or None
+        return self._last_blocks
+
+    def render(self, parsed_blocks, n_force_insert_flag=True, mm_ss_colon_flag=False, highlight_indices=None, timebase=DEFAULT_TIMEBASE):
+        """render_narration_script と同じ結果を返す。"""
+        if parsed_blocks is None: return render_narration_script(parsed_blocks)
+        fragments = self.render_fragments(parsed_blocks, n_force_insert_flag, mm_ss_colon_flag, highlight_indices, timebase)
+        return {"narration_script": join_fragment_lines(fragments), "ai_data": narration_ai_data(parsed_blocks), "start_times": [fragment[1] for fragment in fragments]}
+
+    def render_fragments(self, parsed_blocks, n_force_insert_flag=True, mm_ss_colon_flag=False, highlight_indices=None, timebase=DEFAULT_TIMEBASE):
+        """
+        ブロックごとの描画結果 (出力行のリスト, 開始タイム) のリストを返す。
+        原稿全体の文字列を作らずに、ページ単位の表示や少しずつの書き出しに使える。
+        """
+        if highlight_indices is None: highlight_indices = set()
+        fragment_cache = {}; fragments = []
+        for i, block in enumerate(parsed_blocks):
+            previous_block = parsed_blocks[i-1] if i > 0 else None
+            next_block = parsed_blocks[i+1] if i + 1 < len(parsed_blocks) else None
+            fragment_key = (
+                block,
+                previous_block.end_hh if previous_block is not None else None,
+                (next_block.start_hh, next_block.start_mm, next_block.start_ss, next_block.start_fr) if next_block is not None else None,
+                n_force_insert_flag, mm_ss_colon_flag, i in highlight_indices, timebase
+            )
+            fragment = self._fragment_cache.get(fragment_key)
+            if fragment is None: fragment = render_narration_block(block, previous_block, next_block, n_force_insert_flag, mm_ss_colon_flag, i in highlight_indices, timebase)
+            fragment_cache[fragment_key] = fragment
+            fragments.append(fragment)
+        # 今回使わなかった描画結果は捨て、キャッシュが際限なく増えないようにする
+        self._fragment_cache = fragment_cache
+        return fragments
+
+    def convert(self, text, n_force_insert_flag=True, mm_ss_colon_flag=False, highlight_indices=None, timebase=DEFAULT_TIMEBASE):
+        return self.render(self.parse(text), n_force_insert_flag, mm_ss_colon_flag, highlight_indices, timebase)
+
+
+# ===============================================================
+# ▼▼▼ 複数シーケンスの一括変換 ▼▼▼
+# ===============================================================
+
+# ZIP内のファイル名に使えない文字
+UNSAFE_FILENAME_PATTERN = re.compile(r'[\\/:*?"<>|\x00-\x1F]+')
+
+def convert_premiere_sequence(sequence, n_force_insert_flag=True, mm_ss_colon_flag=False):
+    """
+    parse_premiere_xml_sequences の1シーケンス分を原稿に変換する。ワーカープロセスで実行できるよう、結果は辞書で返す。
+    戻り値は {"name", "rate", "narration_script", "blocks"}（抽出に失敗したシーケンスはエラー文をそのまま原稿欄に入れる）。
+    """
+    caption_text = sequence["caption_text"]
+    if caption_text.startswith(("エラー：", "予期せぬエラー")):
+        return {"name": sequence["name"], "rate": sequence["rate"], "narration_script": caption_text, "blocks": 0}
+    result = convert_narration_script(caption_text, n_force_insert_flag, mm_ss_colon_flag, timebase=sequence["rate"].timebase)
+    return {"name": sequence["name"], "rate": sequence["rate"], "narration_script": result["narration_script"], "blocks": len(result["start_times"])}
+
+def convert_premiere_sequences(sequences, n_force_insert_flag=True, mm_ss_colon_flag=False, max_workers=None):
+    """
+    シーケンスごとの変換をワーカープロセスで並列に行い、入力と同じ順で結果を返す。
+    シーケンスが1つだけ、または max_workers=1 の場合はプロセスを起動せずにその場で変換する。
+    """
+    if len(sequences) <= 1 or max_workers == 1:
+        return [convert_premiere_sequence(sequence, n_force_insert_flag, mm_ss_colon_flag) for sequence in sequences]
+    with ProcessPoolExecutor(max_workers=min(len(sequences), max_workers or os.cpu_count() or 1)) as executor:
+        futures = [executor.submit(convert_premiere_sequence, sequence, n_force_insert_flag, mm_ss_colon_flag) for sequence in sequences]
+        return [future.result() for future in futures]
+
+def sequence_script_filename(index, name):
+    """ZIP内・出力フォルダ内のファイル名。同名のシーケンスがあっても重ならないよう、先頭に通し番号を付ける。"""
+    safe_name = UNSAFE_FILENAME_PATTERN.sub('_', name).strip(' .') or "sequence"
+    return f"{index + 1:02d}_{safe_name}_narration.txt"
+
+def build_sequence_scripts_zip(converted_sequences):
+    """convert_premiere_sequences の結果のうち、変換できた原稿をまとめたZIPファイルの中身（bytes）を返す。"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for i, converted in enumerate(converted_sequences):
+            if converted["narration_script"].startswith(("エラー：", "予期せぬエラー")): continue
+            zip_file.writestr(sequence_script_filename(i, converted["name"]), converted["narration_script"])
+    return buffer.getvalue()
@@ -0,0 +1,18 @@
+import os
+import sys
+
+# syncraft_core などリポジトリ直下のモジュールを、テストから import できるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: 実行時間を比べるテスト。負荷でゆらぐため、pytest -m benchmark と指定した時だけ実行する")
+
+
+def pytest_collection_modifyitems(config, items):
+    if "benchmark" in (config.option.markexpr or ""): return
+    skip_benchmark = pytest.mark.skip(reason="実行時間のテストは pytest -m benchmark で実行する")
+    for item in items:
+        if "benchmark" in item.keywords: item.add_marker(skip_benchmark)
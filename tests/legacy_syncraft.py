@@ -0,0 +1,173 @@
+# ===========================================
+# 高速化する前の実装（テストの比較用）
+# 結果が変わっていないことを確かめるため、元の Syncraft_1.00.py からそのまま写したもの
+# （Python 3.11 以前でも読み込めるよう、f文字列の中の '\\u3000' だけは全角スペースそのものにしてある）
+# ===========================================
+
+import base64
+import re
+
+def decode_premiere_text(base64_string):
+    """
+    Premiereのソーステキスト(Base64)をデコードし、テキスト部分を抽出する（最終修正版）。
+    バイナリデータの中からUTF-8でエンコードされた文字列を直接探し出す。
+    """
+    try:
+        decoded_bytes = base64.b64decode(base64_string)
+        
+        # Premiereのデータ構造では、テキストは多くの場合、特定のバイト列の後に出現する
+        # ここでは、意味のあるUTF-8文字列の開始点を探す
+        # 日本語の多くは3バイトで構成されるため、それらしいバイト列を探す
+        
+        # 最も長いUTF-8として解釈できるバイトシーケンスを探す
+        longest_text = ""
+        # バイト列を少しずつずらしながらデコードを試みる
+        for i in range(len(decoded_bytes)):
+            try:
+                # i番目のバイトから末尾までをUTF-8としてデコード試行
+                chunk = decoded_bytes[i:]
+                text = chunk.decode('utf-8', errors='strict')
+                
+                # デコード成功後、不要な制御文字などを除去
+                clean_text = re.sub(r'[\x00-\x1F\x7F-\x9F]+', '', text).strip()
+                
+                # 最も長いものを本文として採用する
+                if len(clean_text) > len(longest_text):
+                    longest_text = clean_text
+            except UnicodeDecodeError:
+                # デコードに失敗した場合は次のバイトへ
+                continue
+        
+        return longest_text
+
+    except Exception:
+        return ""
+
+def frames_to_df_timecode(total_frames, frame_rate=29.97):
+    if total_frames < 0: return "00;00;00;00"
+    frames_in_minute = 1798
+    frames_in_10_minutes = 17982
+    num_10_minute_chunks = total_frames // frames_in_10_minutes
+    remaining_frames = total_frames % frames_in_10_minutes
+    num_minute_chunks = remaining_frames // frames_in_minute
+    if num_minute_chunks == 10: num_minute_chunks = 9
+    dropped_frames = (18 * num_10_minute_chunks) + (2 * num_minute_chunks)
+    total_non_drop_frames = total_frames + dropped_frames
+    frame_rate_int = 30
+    ff = total_non_drop_frames % frame_rate_int
+    total_seconds = total_non_drop_frames // frame_rate_int
+    ss = total_seconds % 60
+    total_minutes = total_seconds // 60
+    mm = total_minutes % 60
+    hh = total_minutes // 60
+    return f"{hh:02d};{mm:02d};{ss:02d};{ff:02d}"
+
+def convert_narration_script(text, n_force_insert_flag=True, mm_ss_colon_flag=False, highlight_indices=None):
+    if highlight_indices is None: highlight_indices = set()
+    FRAME_RATE = 30.0; CONNECTION_THRESHOLD = 1.0 + (10.0 / FRAME_RATE)
+    to_zenkaku_num = str.maketrans('0123456789', '０１２３４５６７８９')
+    hankaku_symbols = '!@#$%&-+='; zenkaku_symbols = '！＠＃＄％＆－＋＝'
+    hankaku_chars = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 ' + hankaku_symbols
+    zenkaku_chars = 'ａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｖｗｘｙｚＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺ０１２３４５６７８９　' + zenkaku_symbols
+    to_zenkaku_all = str.maketrans(hankaku_chars, zenkaku_chars)
+    to_hankaku_time = str.maketrans('０１２３４５６７８９：〜', '0123456789:~')
+    lines = text.strip().split('\n'); start_index = -1
+    time_pattern = r'(\d{2})[:;](\d{2})[:;](\d{2})[;.](\d{2})\s*-\s*(\d{2})[:;](\d{2})[:;](\d{2})[;.](\d{2})'
+    for i, line in enumerate(lines):
+        line_with_frames = re.sub(r'(\d{2}:\d{2}:\d{2})(?![:.]\d{2})', r'\1.00', line)
+        normalized_line = line_with_frames.strip().translate(to_hankaku_time).replace('~', '-')
+        if re.match(time_pattern, normalized_line): start_index = i; break
+    if start_index == -1: return {"narration_script": "エラー：変換可能なタイムコードが見つかりませんでした。", "ai_data": [], "start_times": []}
+    relevant_lines = lines[start_index:]; blocks = []; i = 0
+    while i < len(relevant_lines):
+        current_line = relevant_lines[i].strip()
+        if not current_line: i += 1; continue
+        line_with_frames = re.sub(r'(\d{2}:\d{2}:\d{2})(?![:.]\d{2})', r'\1.00', current_line)
+        normalized_line = line_with_frames.translate(to_hankaku_time).replace('~', '-')
+        if re.match(time_pattern, normalized_line):
+            time_val = current_line; text_lines = []; i += 1
+            while i < len(relevant_lines):
+                if not relevant_lines[i].strip(): break
+                next_line_with_frames = re.sub(r'(\d{2}:\d{2}:\d{2})(?![:.]\d{2})', r'\1.00', relevant_lines[i].strip())
+                next_normalized = next_line_with_frames.translate(to_hankaku_time).replace('~', '-')
+                if re.match(time_pattern, next_normalized): break
+                text_lines.append(relevant_lines[i]); i += 1
+            text_val = "\n".join(text_lines); blocks.append({'time': time_val, 'text': text_val})
+        else: i += 1
+    output_lines = []; narration_blocks_for_ai = []; parsed_blocks = []; block_start_times = []
+    for block in blocks:
+        line_with_frames = re.sub(r'(\d{2}:\d{2}:\d{2})(?![:.]\d{2})', r'\1.00', block['time'])
+        normalized_time_str = line_with_frames.translate(to_hankaku_time).replace('~', '-')
+        time_match = re.match(time_pattern, normalized_time_str)
+        if not time_match: continue
+        groups = time_match.groups()
+        start_hh, start_mm, start_ss, start_fr, end_hh, end_mm, end_ss, end_fr = [int(g or 0) for g in groups]
+        narration_blocks_for_ai.append({'time': block['time'].strip(), 'text': block['text'].strip()})
+        parsed_blocks.append({'start_hh': start_hh, 'start_mm': start_mm, 'start_ss': start_ss, 'start_fr': start_fr,'end_hh': end_hh, 'end_mm': end_mm, 'end_ss': end_ss, 'end_fr': end_fr,'text': block['text']})
+    previous_end_hh = None
+    for i, block in enumerate(parsed_blocks):
+        start_hh, start_mm, start_ss, start_fr = block['start_hh'], block['start_mm'], block['start_ss'], block['start_fr']
+        end_hh, end_mm, end_ss, end_fr = block['end_hh'], block['end_mm'], block['end_ss'], block['end_fr']
+        should_insert_h_marker = False; marker_hh_to_display = -1
+        if i == 0:
+            if start_hh > 0: should_insert_h_marker = True; marker_hh_to_display = start_hh
+            previous_end_hh = end_hh
+        else:
+            if start_hh < end_hh: should_insert_h_marker = True; marker_hh_to_display = end_hh
+            elif previous_end_hh is not None and start_hh > previous_end_hh: should_insert_h_marker = True; marker_hh_to_display = start_hh
+        if should_insert_h_marker: output_lines.append(""); output_lines.append(f"【{str(marker_hh_to_display).translate(to_zenkaku_num)}Ｈ】")
+        previous_end_hh = end_hh
+        total_seconds_in_minute_loop = (start_mm % 60) * 60 + start_ss
+        spacer = ""; is_half_time = False; base_time_str = ""
+        if 0 <= start_fr <= 9:
+            display_mm = (total_seconds_in_minute_loop // 60) % 60; display_ss = total_seconds_in_minute_loop % 60
+            base_time_str = f"{display_mm:02d}{display_ss:02d}"; spacer = "　　　"
+        elif 10 <= start_fr <= 22:
+            display_mm = (total_seconds_in_minute_loop // 60) % 60; display_ss = total_seconds_in_minute_loop % 60
+            base_time_str = f"{display_mm:02d}{display_ss:02d}"; spacer = "　　"; is_half_time = True
+        else:
+            total_seconds_in_minute_loop += 1
+            display_mm = (total_seconds_in_minute_loop // 60) % 60; display_ss = total_seconds_in_minute_loop % 60
+            base_time_str = f"{display_mm:02d}{display_ss:02d}"; spacer = "　　　"
+        colon_time_str = f"{base_time_str[:2]}：{base_time_str[2:]}" if mm_ss_colon_flag else base_time_str
+        formatted_start_time = f"{colon_time_str.translate(to_zenkaku_num)}半" if is_half_time else colon_time_str.translate(to_zenkaku_num)
+        block_start_times.append(formatted_start_time)
+        text_content = block['text'].strip(' \u3000'); speaker_symbol = ''; body = ''
+        if n_force_insert_flag:
+            speaker_symbol = 'Ｎ'
+            n_match = re.match(r'^[\s　]*[NnＮｎ](?:[\s　]*[：:])?(?![A-Za-z0-9])[\s　]*(.*)$', text_content, re.DOTALL)
+            if n_match: body = n_match.group(1)
+            else: body = text_content
+        else: speaker_symbol = ''; body = text_content
+        body = body.strip(' \u3000')
+        if not body: body = "※注意！本文なし！"
+        body = body.translate(to_zenkaku_all)
+        end_string = ""; add_blank_line = True
+        if i + 1 < len(parsed_blocks):
+            next_block = parsed_blocks[i+1]
+            end_total_seconds = (end_hh * 3600) + (end_mm * 60) + end_ss + (end_fr / FRAME_RATE)
+            next_start_total_seconds = (next_block['start_hh'] * 3600) + (next_block['start_mm'] * 60) + next_block['start_ss'] + (next_block['start_fr'] / FRAME_RATE)
+            if next_start_total_seconds - end_total_seconds < CONNECTION_THRESHOLD: add_blank_line = False
+        if add_blank_line:
+            adj_ss = end_ss; adj_mm = end_mm
+            if 0 <= end_fr <= 9: adj_ss = end_ss - 1
+            if adj_ss < 0: adj_ss = 59; adj_mm -= 1
+            adj_mm_display = adj_mm % 60
+            if start_hh != end_hh or (start_mm % 60) != adj_mm_display: formatted_end_time = f"{adj_mm_display:02d}{adj_ss:02d}".translate(to_zenkaku_num)
+            else: formatted_end_time = f"{adj_ss:02d}".translate(to_zenkaku_num)
+            end_string = f" ／{formatted_end_time}"
+        line_prefix = "🔴" if i in highlight_indices else ""
+        body_lines = body.split('\n')
+        first_line_prefix_parts = [formatted_start_time, spacer]
+        if speaker_symbol: first_line_prefix_parts.append(f"{speaker_symbol}　")
+        first_line_prefix = "".join(first_line_prefix_parts)
+        indent_space = '　' * len(first_line_prefix)
+        first_line_text = body_lines[0].lstrip(' \u3000')
+        end_string_for_first_line = end_string if len(body_lines) == 1 else ""
+        output_lines.append(f"{line_prefix}{first_line_prefix}{first_line_text}{end_string_for_first_line}")
+        if len(body_lines) > 1:
+            for k, line_text in enumerate(body_lines[1:]):
+                end_string_for_this_line = end_string if k == len(body_lines) - 2 else ""
+                output_lines.append(f"{indent_space}{line_text.lstrip(' 　')}{end_string_for_this_line}")
+        if add_blank_line and i < len(parsed_blocks) - 1: output_lines.append("")
+    return {"narration_script": "\n".join(output_lines), "ai_data": narration_blocks_for_ai, "start_times": block_start_times}
@@ -0,0 +1,31 @@
+import csv
+
+from syncraft_bench import make_sequence_xml
+import syncraft_cli
+
+
+def read_timings(output_dir):
+    with open(output_dir / "timings.csv", encoding="utf-8") as f: return list(csv.DictReader(f))
+
+
+def test_unusable_text_cache_falls_back_to_no_cache(tmp_path, monkeypatch):
+    # キャッシュの置き場所がファイルで塞がれていても、アプリと同じくキャッシュなしで変換を続ける
+    (tmp_path / "in").mkdir(); (tmp_path / "not_a_dir").write_text("")
+    (tmp_path / "in" / "episode.xml").write_bytes(make_sequence_xml(20))
+    monkeypatch.setenv("SYNCRAFT_CACHE_DIR", str(tmp_path / "not_a_dir"))
+    monkeypatch.setattr(syncraft_cli, "_worker_text_cache", None)
+    assert syncraft_cli.main([str(tmp_path / "in"), str(tmp_path / "out"), "-j", "1", "--text-cache"]) == 0
+    assert [row["status"] for row in read_timings(tmp_path / "out")] == ["ok"]
+    assert (tmp_path / "out" / "episode_narration.txt").exists()
+
+
+def test_same_name_with_different_extensions_do_not_overwrite_each_other(tmp_path):
+    (tmp_path / "in").mkdir()
+    (tmp_path / "in" / "episode.xml").write_bytes(make_sequence_xml(20))
+    (tmp_path / "in" / "episode.txt").write_text("00;00;01;00 - 00;00;02;00\nテキストの原稿です", encoding="utf-8")
+    (tmp_path / "in" / "other.txt").write_text("00;00;01;00 - 00;00;02;00\n別の原稿です", encoding="utf-8")
+    assert syncraft_cli.main([str(tmp_path / "in"), str(tmp_path / "out"), "-j", "1"]) == 0
+    outputs = {row["file"]: row["output"] for row in read_timings(tmp_path / "out")}
+    assert outputs == {"episode.txt": "episode_txt_narration.txt", "episode.xml": "episode_xml_narration.txt", "other.txt": "other_narration.txt"}
+    assert "テキストの原稿です" in (tmp_path / "out" / "episode_txt_narration.txt").read_text(encoding="utf-8")
+    assert "テキストの原稿です" not in (tmp_path / "out" / "episode_xml_narration.txt").read_text(encoding="utf-8")
@@ -0,0 +1,43 @@
+import base64
+import random
+
+import pytest
+
+import legacy_syncraft
+from syncraft_bench import make_caption_phrase, make_premiere_text_payload
+from syncraft_core import decode_premiere_text
+
+# 正しいUTF-8・制御文字（C0/C1）・不正なバイト・途中で切れたマルチバイト文字を混ぜる
+BYTE_PIECES = [
+    b'\x00', b'\x01', b'\x1f', b'\x7f', b'\xc2\x85', b'A', b' ', b'\n', 'あ'.encode(), 'é'.encode(), '😀'.encode(), '　'.encode(),
+    b'\x80', b'\xe3', b'\xe3\x81', b'\xff', b'\xc3', b'\xed\xa0\x80', b'\xf4\x90\x80\x80',
+]
+
+
+def test_matches_legacy_on_random_payloads():
+    rnd = random.Random(1)
+    for _ in range(30000):
+        payload = b''.join(rnd.choice(BYTE_PIECES) for _ in range(rnd.randint(0, 12)))
+        if rnd.random() < 0.3: payload = bytes(rnd.randrange(256) for _ in range(rnd.randint(0, 10))) + payload
+        base64_string = base64.b64encode(payload).decode()
+        assert decode_premiere_text(base64_string) == legacy_syncraft.decode_premiere_text(base64_string), payload
+
+
+def test_matches_legacy_on_premiere_like_payloads():
+    # 書式のバイナリ（フォント名など）の後ろに本文が続く、Premiereのソーステキストと同じ形のペイロード
+    rnd = random.Random(2)
+    for _ in range(2000):
+        text = make_caption_phrase(rnd, rnd.randint(1, 3))
+        base64_string = make_premiere_text_payload(text, rnd)
+        assert decode_premiere_text(base64_string) == legacy_syncraft.decode_premiere_text(base64_string) == text.replace('\n', '')
+
+
+@pytest.mark.parametrize("base64_string", [
+    "", "!!!", "not base64",
+    base64.b64encode(b"\xff").decode(),
+    base64.b64encode("テロップだけ".encode()).decode(),
+    base64.b64encode(b"\x00\x00\x80\x3f" + "　前後に全角スペース　".encode()).decode(),
+    base64.b64encode("途中で切れた文字".encode()[:-1]).decode(),
+])
+def test_matches_legacy_on_edge_cases(base64_string):
+    assert decode_premiere_text(base64_string) == legacy_syncraft.decode_premiere_text(base64_string)
@@ -0,0 +1,68 @@
+import re
+
+from syncraft_core import GEMINI_CHUNK_BLOCKS, build_ai_check_display, check_narration_with_gemini
+
+
+class FakeAPIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"{code} Bad Request"); self.code = code
+
+
+class FakeModels:
+    """No.の10の倍数のブロックを指摘し、fail_numbers を含むチャンクは400で失敗する偽のGemini。"""
+    def __init__(self, fail_numbers=()):
+        self.fail_numbers = set(fail_numbers); self.sent_numbers = []
+
+    def generate_content(self, model, contents):
+        numbers = [int(no) for no in re.findall(r'^\s*No\.(\d+):', contents, re.M)]
+        self.sent_numbers.extend(numbers)
+        if self.fail_numbers & set(numbers): raise FakeAPIError(400)
+        rows = [f"| {no} | 誤字{no} → 誤字 | 誤りでは？ |" for no in numbers if no % 10 == 0]
+        text = "| No. | 修正提案 | 理由 |\n|---|---|---|\n" + "\n".join(rows) if rows else "問題ありませんでした。"
+        return type("Response", (), {"text": text})()
+
+
+class FakeClient:
+    def __init__(self, fail_numbers=()):
+        self.models = FakeModels(fail_numbers)
+
+
+def make_blocks(count):
+    return [{"time": f"00:{i // 60:02d}:{i % 60:02d}", "text": f"ナレーション{i + 1}です"} for i in range(count)]
+
+
+def test_failed_chunk_is_reported_and_resent():
+    blocks = make_blocks(100); start_times = [block["time"] for block in blocks]
+    result_cache = {}; check_stats = {}
+    client = FakeClient(fail_numbers={50})
+    ai_result_md = check_narration_with_gemini(blocks, None, result_cache, client, check_stats)
+    highlight_indices, display_text, errors = build_ai_check_display(ai_result_md, start_times)
+    failed_chunk = range(GEMINI_CHUNK_BLOCKS, 2 * GEMINI_CHUNK_BLOCKS)
+    assert check_stats["failed_chunks"] == 1
+    # 失敗したチャンクの外の指摘はテーブルに出て、失敗はテーブルとは別に返る
+    assert highlight_indices == {no - 1 for no in range(10, 101, 10) if no - 1 not in failed_chunk}
+    assert "400" not in display_text
+    assert len(errors) == 1 and "400" in errors[0] and f"No.{failed_chunk[0] + 1}〜{failed_chunk[-1] + 1}" in errors[0]
+
+    # 次のチェックでは、失敗したチャンクのブロックだけを送り直す
+    client.models.fail_numbers = set(); client.models.sent_numbers = []
+    ai_result_md = check_narration_with_gemini(blocks, None, result_cache, client, check_stats)
+    highlight_indices, display_text, errors = build_ai_check_display(ai_result_md, start_times)
+    assert sorted(client.models.sent_numbers) == [i + 1 for i in failed_chunk]
+    assert check_stats["failed_chunks"] == 0 and errors == []
+    assert highlight_indices == {no - 1 for no in range(10, 101, 10)}
+
+
+def test_all_chunks_failing_is_not_reported_as_no_findings():
+    blocks = make_blocks(100); check_stats = {}
+    ai_result_md = check_narration_with_gemini(blocks, None, {}, FakeClient(fail_numbers=range(1, 101)), check_stats)
+    highlight_indices, display_text, errors = build_ai_check_display(ai_result_md, [block["time"] for block in blocks])
+    assert check_stats["failed_chunks"] == check_stats["chunks"] == len(errors) == 3
+    assert highlight_indices == set() and display_text == ""
+    assert "問題ありませんでした" not in ai_result_md
+
+
+def test_no_findings():
+    blocks = make_blocks(5)
+    ai_result_md = check_narration_with_gemini(blocks, None, {}, FakeClient())
+    assert build_ai_check_display(ai_result_md, [block["time"] for block in blocks]) == (set(), "問題ありませんでした。", [])
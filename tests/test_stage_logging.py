@@ -0,0 +1,30 @@
+import io
+import logging
+
+from syncraft_core import enable_stage_logging, stage_logger
+
+
+def remove_stage_handlers():
+    for handler in [handler for handler in stage_logger.handlers if getattr(handler, "syncraft_stage_handler", False)]:
+        stage_logger.removeHandler(handler)
+
+
+def test_level_names_are_case_insensitive():
+    remove_stage_handlers()
+    try:
+        enable_stage_logging(" debug ", io.StringIO())
+        assert stage_logger.level == logging.DEBUG
+    finally:
+        remove_stage_handlers()
+
+
+def test_unknown_level_name_falls_back_to_info():
+    # SYNCRAFT_LOG_LEVEL の打ち間違いで、アプリの起動自体が止まらないこと
+    remove_stage_handlers(); stream = io.StringIO()
+    try:
+        enable_stage_logging("verbose", stream)
+        enable_stage_logging("verbose", stream)
+        assert stage_logger.level == logging.INFO
+        assert stream.getvalue().count("VERBOSE") == 1
+    finally:
+        remove_stage_handlers()
@@ -0,0 +1,43 @@
+import base64
+import time
+
+from syncraft_core import DecodedTextCache, decode_premiere_text
+
+
+def make_payload(text):
+    return base64.b64encode(b"\x00\xff" + text.encode("utf-8")).decode()
+
+
+def test_workers_sharing_one_file_do_not_block_each_other(tmp_path):
+    # CLIの -j N と同じく、2つのプロセス（接続）が同じキャッシュファイルに交互に書き込む
+    path = str(tmp_path / "decoded_text.sqlite3")
+    first = DecodedTextCache(path); second = DecodedTextCache(path)
+    started = time.perf_counter()
+    for i in range(3):
+        assert first.get_or_decode(f"a{i}", make_payload(f"一つ目{i}")) == f"一つ目{i}"
+        assert second.get_or_decode(f"b{i}", make_payload(f"二つ目{i}")) == f"二つ目{i}"
+    first.commit(); second.commit()
+    # 以前はsqliteのロック待ち（5秒）で止まり、その後の書き込みが失われていた
+    assert time.perf_counter() - started < 1.0
+
+    reopened = DecodedTextCache(path)
+    for i in range(3):
+        assert reopened.get_or_decode(f"a{i}", make_payload(f"一つ目{i}")) == f"一つ目{i}"
+        assert reopened.get_or_decode(f"b{i}", make_payload(f"二つ目{i}")) == f"二つ目{i}"
+    assert reopened.stats() == {"hits": 6, "misses": 0}
+
+
+def test_uncommitted_results_are_reused_and_lru_evicts(tmp_path):
+    path = str(tmp_path / "decoded_text.sqlite3")
+    cache = DecodedTextCache(path, max_bytes=300)
+    payloads = [make_payload("テロップ" * 5 + str(i)) for i in range(6)]
+    for i, payload in enumerate(payloads): cache.get_or_decode(f"h{i}", payload)
+    cache.get_or_decode("h0", payloads[0])
+    assert cache.stats() == {"hits": 1, "misses": 6}
+    cache.commit()
+
+    # 上限を超えた分は古いものから消え、残ったものはデコードせずに返る
+    reopened = DecodedTextCache(path, max_bytes=300)
+    results = [reopened.get_or_decode(f"h{i}", payload) for i, payload in enumerate(payloads)]
+    assert results == [decode_premiere_text(payload) for payload in payloads]
+    assert 0 < reopened.stats()["hits"] < len(payloads)
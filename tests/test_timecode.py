@@ -0,0 +1,80 @@
+import random
+import sys
+
+import pytest
+
+import legacy_syncraft
+from syncraft_core import NTSC_30_DF, TIMECODE_RATES, TimecodeRate, frames_to_df_timecode, frames_to_timecode, frames_to_timecodes
+
+FRAME_COUNTS = list(range(0, 40000)) + random.Random(1).sample(range(10 ** 8), 5000) + [-1, -5]
+
+
+@pytest.fixture(params=["numpy", "no-numpy"])
+def numpy_mode(request, monkeypatch):
+    """frames_to_timecodes を、NumPyの配列演算と1件ずつの計算の両方で試す。"""
+    if request.param == "numpy": pytest.importorskip("numpy")
+    else: monkeypatch.setitem(sys.modules, "numpy", None)
+    return request.param
+
+
+def timecode_to_frames(timecode, rate):
+    hh, mm, ss, ff = map(int, timecode.split(';'))
+    total_minutes = hh * 60 + mm
+    total_frames = (total_minutes * 60 + ss) * rate.timebase + ff
+    if rate.drop_frame: total_frames -= rate.dropped_per_minute * (total_minutes - total_minutes // 10)
+    return total_frames
+
+
+@pytest.mark.parametrize("label", sorted(TIMECODE_RATES))
+def test_batch_matches_scalar_and_round_trips(label, numpy_mode):
+    rate = TIMECODE_RATES[label]
+    timecodes = frames_to_timecodes(FRAME_COUNTS, rate)
+    assert timecodes == [frames_to_timecode(total_frames, rate) for total_frames in FRAME_COUNTS]
+    for total_frames, timecode in zip(FRAME_COUNTS, timecodes):
+        if total_frames < 0:
+            assert timecode == "00;00;00;00"; continue
+        assert timecode_to_frames(timecode, rate) == total_frames, (total_frames, timecode)
+        # ドロップフレームでは、10分ごとを除く毎分の先頭の番号（29.97なら ;00 と ;01）は使われない
+        if rate.drop_frame:
+            _, mm, ss, ff = map(int, timecode.split(';'))
+            assert not (ss == 0 and ff < rate.dropped_per_minute and mm % 10 != 0), (total_frames, timecode)
+
+
+def test_empty_batch(numpy_mode):
+    assert frames_to_timecodes([], NTSC_30_DF) == []
+
+
+@pytest.mark.parametrize("total_frames, expected", [
+    (0, "00;00;00;00"), (1797, "00;00;59;27"),
+    # 以前の実装は 1798・1799 を 00;01;00;00・00;01;00;01 としていた（ドロップされる番号で、1分の先頭も2フレームずれていた）
+    (1798, "00;00;59;28"), (1799, "00;00;59;29"), (1800, "00;01;00;02"),
+    (17981, "00;09;59;29"), (17982, "00;10;00;00"), (17983, "00;10;00;01"), (19780, "00;10;59;28"), (19782, "00;11;00;02"),
+    (107892, "01;00;00;00"),
+])
+def test_pinned_drop_frame_timecodes(total_frames, expected):
+    assert frames_to_df_timecode(total_frames) == expected
+    assert frames_to_timecode(total_frames, NTSC_30_DF) == expected
+
+
+def test_differs_from_legacy_only_where_legacy_produced_dropped_labels():
+    for total_frames in range(0, 200000):
+        legacy_timecode = legacy_syncraft.frames_to_df_timecode(total_frames)
+        if legacy_timecode == frames_to_df_timecode(total_frames): continue
+        _, mm, ss, ff = map(int, legacy_timecode.split(';'))
+        assert ss == 0 and ff < 2 and mm % 10 != 0, (total_frames, legacy_timecode)
+
+
+def test_rate_labels_and_xml():
+    assert TimecodeRate.from_fps(29.97).label == "29.97DF"
+    assert TimecodeRate.from_fps(23.976).label == "23.976" and not TimecodeRate.from_fps(23.976).drop_frame
+    assert TimecodeRate.from_fps(25).label == "25"
+    assert TimecodeRate.from_xml("30", "TRUE", "NDF").label == "29.97NDF"
+    assert TimecodeRate.from_xml("60", "TRUE").label == "59.94DF"
+
+
+@pytest.mark.parametrize("timebase, ntsc", [("24", "TRUE"), ("24", "FALSE"), ("25", "FALSE"), ("30", "FALSE")])
+def test_df_flag_is_ignored_where_there_is_no_drop_frame(timebase, ntsc):
+    # 23.976・25 などにはドロップフレームのタイムコードがないので、XMLに DF とあってもノンドロップで数える
+    rate = TimecodeRate.from_xml(timebase, ntsc, "DF")
+    assert not rate.drop_frame and rate.dropped_per_minute == 0
+    assert frames_to_timecode(int(timebase) * 60, rate) == "00;01;00;00"
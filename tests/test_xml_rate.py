@@ -0,0 +1,26 @@
+import io
+import random
+
+from syncraft_bench import make_premiere_text_payload
+from syncraft_core import parse_premiere_xml
+
+
+def make_sequence(name, timebase, ntsc, display_format, start_frame, text):
+    rate = f"<rate><timebase>{timebase}</timebase><ntsc>{ntsc}</ntsc></rate>"
+    timecode = f"<timecode>{rate}<displayformat>{display_format}</displayformat></timecode>" if display_format else ""
+    payload = make_premiere_text_payload(text, random.Random(0))
+    return (
+        f"<sequence><name>{name}</name>{rate}{timecode}<media><video><track>"
+        f"<clipitem><start>{start_frame}</start><end>{start_frame + timebase}</end><filter><effect>"
+        f"<parameter><parameterid>1</parameterid><name>Source Text</name><hash>{name}</hash><value>{payload}</value></parameter>"
+        "</effect></filter></clipitem></track></video></media></sequence>"
+    )
+
+
+def test_rate_and_display_format_come_from_the_same_sequence():
+    # 最初のシーケンス（23.976、displayformatなし）のレートに、2つめのシーケンスのDFを混ぜない
+    xml = "<xmeml><project><children>" + make_sequence("A", 24, "TRUE", None, 1440, "一つめ") + make_sequence("B", 30, "TRUE", "DF", 0, "二つめ") + "</children></project></xmeml>"
+    sequence_info = {}
+    caption_text = parse_premiere_xml(io.BytesIO(xml.encode("utf-8")), sequence_info=sequence_info)
+    assert sequence_info["rate"].label == "23.976" and not sequence_info["rate"].drop_frame
+    assert caption_text.startswith("00;01;00;00 - 00;01;01;00\n一つめ")
@@ -0,0 +1,43 @@
+import io
+import time
+
+import pytest
+
+from syncraft_bench import make_sequence_xml
+from syncraft_core import scan_premiere_xml
+
+# clipitem数を 100 → 100,000 まで増やしても、1件あたりの時間がほぼ変わらない（線形に伸びる）ことを確かめる
+# 以前の実装はclipitemごとに部分木を探し直していたため、件数が増えるほど1件あたりの時間も伸びていた
+CLIP_COUNTS = [100, 1000, 10000, 100000]
+# 時間のゆらぎを許すための、1件あたりの時間の許容倍率（基準は1,000件）
+MAX_PER_CLIP_RATIO = 2.0
+
+
+def seconds_per_clip(clip_count, repeat):
+    # テキストは使い回しを多くして、XMLの生成時間を抑える（clipitemの数は変わらない）
+    xml_bytes = make_sequence_xml(clip_count, repeat_ratio=0.95)
+    best_seconds = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        captions, sequences = scan_premiere_xml(io.BytesIO(xml_bytes))
+        best_seconds = min(best_seconds, time.perf_counter() - started)
+    assert len(captions) == clip_count and len(sequences) == 1
+    return best_seconds / clip_count
+
+
+def test_scan_finds_every_clipitem():
+    xml_bytes = make_sequence_xml(1000, sequences=3, repeat_ratio=0.95)
+    scan_stats = {}
+    captions, sequences = scan_premiere_xml(io.BytesIO(xml_bytes), scan_stats=scan_stats)
+    assert len(captions) == 1000 and len(sequences) == 3
+    # デコードは同じhashのテキストにつき1回だけ（使い回しが多いので、clipitemの数よりずっと少ない）
+    assert len({caption[3] for caption in captions}) <= scan_stats["decoded_texts"] < len(captions) // 2 and scan_stats["decode_seconds"] > 0
+    assert [caption[0] for caption in captions] == [0] * 334 + [1] * 333 + [2] * 333
+
+
+@pytest.mark.benchmark
+def test_scan_scales_linearly_with_clipitems():
+    per_clip = {clip_count: seconds_per_clip(clip_count, repeat=5 if clip_count <= 1000 else 1) for clip_count in CLIP_COUNTS}
+    base = per_clip[1000]
+    for clip_count, seconds in per_clip.items():
+        assert seconds <= base * MAX_PER_CLIP_RATIO, f"{clip_count}件: 1件あたり {seconds * 1e6:.1f}µs（1,000件では {base * 1e6:.1f}µs）"